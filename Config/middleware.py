@@ -1,9 +1,60 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from coreapp.utils import identity_map_utils
+
+
 class CustomMiddleWare:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(await self.get_response(request))
+
+    def process_response(self, response):
         if response.status_code == 204:
             response.status_code = 200
         return response
+
+
+class IdentityMapMiddleware:
+    """ Gives every request its own identity map, dropped when the response is returned """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = identity_map_utils.begin()
+        try:
+            return self.process_response(self.get_response(request))
+        finally:
+            identity_map_utils.end(token)
+
+    async def __acall__(self, request):
+        # The context variable is local to the task serving this request
+        token = identity_map_utils.begin()
+        try:
+            return self.process_response(await self.get_response(request))
+        finally:
+            identity_map_utils.end(token)
+
+    def process_response(self, response):
+        if settings.DEBUG:
+            response['X-Identity-Map-Hits'] = identity_map_utils.current().hits
+        return response
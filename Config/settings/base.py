@@ -29,7 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'rest_framework',
-    'rest_framework.authtoken',
+    'rest_framework.authtoken',  # legacy tokens, copied into coreapp.AuthToken by its migration
     'django_filters',
     'corsheaders',
     'drf_spectacular',
@@ -48,6 +48,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'Config.middleware.CustomMiddleWare',
+    'Config.middleware.IdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'Config.urls'
@@ -74,7 +75,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 30,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'coreapp.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -82,6 +83,25 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    'DEFAULT_THROTTLE_CLASSES': [
+        'coreapp.throttling.IPRateThrottle',
+        'coreapp.throttling.MobileRateThrottle',
+    ],
+    # Reverse proxies in front of the app, the throttled client address is the X-Forwarded-For entry they added
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+    # "<throttle_scope>_ip" / "<throttle_scope>_mobile" for views that set throttle_scope
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_mobile': '10/min',
+        'otp_send_ip': '10/hour',
+        'otp_send_mobile': '5/hour',
+        'forget_password_ip': '10/hour',
+        'forget_password_mobile': '5/hour',
+        'otp_check_ip': '30/min',
+        'otp_check_mobile': '10/min',
+        'payment_ip': '20/hour',
+        'payment_status_ip': '60/min',
+    },
     'DEFAULT_RENDERER_CLASSES': [
         'coreapp.renderers.CustomRenderer',
     ],
@@ -102,6 +122,56 @@ SPECTACULAR_SETTINGS = {
     },
     # OTHER SETTINGS
 }
+
+# API tokens (coreapp.models.AuthToken), expiry is pushed back to AUTH_TOKEN_TTL seconds from the last use
+# at most once per AUTH_TOKEN_REFRESH_INTERVAL seconds
+AUTH_TOKEN_TTL = config('AUTH_TOKEN_TTL', default=30 * 24 * 60 * 60, cast=int)
+AUTH_TOKEN_REFRESH_INTERVAL = config('AUTH_TOKEN_REFRESH_INTERVAL', default=24 * 60 * 60, cast=int)
+
+# Token authentication cache (coreapp.authentication.CachedTokenAuthentication)
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60, cast=int)
+TOKEN_CACHE_MAX_SIZE = config('TOKEN_CACHE_MAX_SIZE', default=10000, cast=int)
+
+# Audit writer for login history and OTP confirmations (coreapp.utils.audit_utils),
+# set AUDIT_ASYNC=False to write inline in tests
+AUDIT_ASYNC = config('AUDIT_ASYNC', default=True, cast=bool)
+AUDIT_BATCH_SIZE = config('AUDIT_BATCH_SIZE', default=100, cast=int)
+AUDIT_FLUSH_INTERVAL = config('AUDIT_FLUSH_INTERVAL', default=2.0, cast=float)
+AUDIT_QUEUE_SIZE = config('AUDIT_QUEUE_SIZE', default=10000, cast=int)
+
+# One time passwords (coreapp.utils.otp_utils)
+OTP_TTL = config('OTP_TTL', default=600, cast=int)
+OTP_MAX_ATTEMPTS = config('OTP_MAX_ATTEMPTS', default=5, cast=int)
+
+# Password hashing pool (coreapp.utils.hasher_utils), 0 hashes inline in the request thread
+PASSWORD_HASHER_POOL_SIZE = config('PASSWORD_HASHER_POOL_SIZE', default=0, cast=int)
+PASSWORD_HASHER_MAX_PENDING = config('PASSWORD_HASHER_MAX_PENDING', default=32, cast=int)
+
+# Route SignupAPI, LoginView, PasswordChangeAPI, ResendVerificationAPI, ForgetPasswordAPI and InfoAPI to their async
+# variants, for ASGI servers
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Payment provider HTTP clients (coreapp.utils.http_utils.ProviderClient), timeouts and backoff in seconds
+PROVIDER_CONNECT_TIMEOUT = config('PROVIDER_CONNECT_TIMEOUT', default=3.05, cast=float)
+PROVIDER_READ_TIMEOUT = config('PROVIDER_READ_TIMEOUT', default=15.0, cast=float)
+PROVIDER_MAX_RETRIES = config('PROVIDER_MAX_RETRIES', default=2, cast=int)
+PROVIDER_RETRY_BACKOFF = config('PROVIDER_RETRY_BACKOFF', default=0.5, cast=float)
+PROVIDER_POOL_SIZE = config('PROVIDER_POOL_SIZE', default=10, cast=int)
+
+# PayPal OAuth tokens (utility.utils.paypal_utils.AccessTokenCache) are used until expires_in minus the margin,
+# and refreshed in the background once less than PAYPAL_TOKEN_REFRESH_AHEAD seconds are left
+PAYPAL_TOKEN_EXPIRY_MARGIN = config('PAYPAL_TOKEN_EXPIRY_MARGIN', default=60, cast=int)
+PAYPAL_TOKEN_REFRESH_AHEAD = config('PAYPAL_TOKEN_REFRESH_AHEAD', default=300, cast=int)
+
+# Payment bill outbox (utility.utils.payment_utils, process_payment_outbox command), seconds. Failed attempts
+# are retried after PAYMENT_OUTBOX_RETRY_BACKOFF doubled per attempt, PAYMENT_POLL_TIMEOUT caps the ?wait of the
+# payment status API, PAYMENT_FAKE_PROVIDER skips BillPlz and PayPal for tests
+PAYMENT_OUTBOX_MAX_ATTEMPTS = config('PAYMENT_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+PAYMENT_OUTBOX_RETRY_BACKOFF = config('PAYMENT_OUTBOX_RETRY_BACKOFF', default=30, cast=int)
+PAYMENT_OUTBOX_CLAIM_TIMEOUT = config('PAYMENT_OUTBOX_CLAIM_TIMEOUT', default=120, cast=int)
+PAYMENT_POLL_TIMEOUT = config('PAYMENT_POLL_TIMEOUT', default=10, cast=int)
+PAYMENT_FAKE_PROVIDER = config('PAYMENT_FAKE_PROVIDER', default=False, cast=bool)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -151,3 +221,12 @@ EMAIL_PORT = config('EMAIL_PORT', cast=int)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 EMAIL_USE_SSL = True
+
+# Email dispatch pool (coreapp.email_utils.EmailDispatcher)
+EMAIL_WORKERS = config('EMAIL_WORKERS', default=2, cast=int)
+EMAIL_QUEUE_SIZE = config('EMAIL_QUEUE_SIZE', default=1000, cast=int)
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=20, cast=int)
+EMAIL_MAX_RETRIES = config('EMAIL_MAX_RETRIES', default=3, cast=int)
+EMAIL_RETRY_BACKOFF = config('EMAIL_RETRY_BACKOFF', default=1.0, cast=float)
+EMAIL_QUEUE_TIMEOUT = config('EMAIL_QUEUE_TIMEOUT', default=5.0, cast=float)
+EMAIL_IDLE_TIMEOUT = config('EMAIL_IDLE_TIMEOUT', default=30.0, cast=float)
@@ -28,12 +28,13 @@ STATIC_ROOT = config('STATIC_ROOT')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = config('MEDIA_ROOT')
 
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
-#         'LOCATION': config('CACHE_LOCATION'),
-#     }
-# }
+# Shared between workers: OTP codes, throttling counters
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': config('CACHE_LOCATION'),
+    }
+}
 
 LOGGING = {
     'version': 1,
@@ -3,13 +3,14 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from coreapp.base import AsyncValidationMixin, SparseFieldsMixin
 from coreapp.models import Country, Document
-from coreapp.utils import auth_utils, otp_utils
+from coreapp.utils import auth_utils, hasher_utils, otp_utils
 
 UserModel = get_user_model()
 
 
-class CountrySerializer(serializers.ModelSerializer):
+class CountrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Country
         fields = '__all__'
@@ -34,13 +35,22 @@ class SignupSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         confirm_password = validated_data.pop('confirm_password')
         user = UserModel.objects.create(**validated_data)
-        user.set_password(confirm_password)
+        hasher_utils.set_password(user, confirm_password)
         user.is_approved = True
         user.save()
         return user
 
+    async def acreate(self, validated_data):
+        """ create() for async views, hashes first so the user is written with a single INSERT """
+        confirm_password = validated_data.pop('confirm_password')
+        user = UserModel(**validated_data)
+        await hasher_utils.aset_password(user, confirm_password)
+        user.is_approved = True
+        await user.asave()
+        return user
+
 
-class LoginSerializer(serializers.Serializer):
+class LoginSerializer(AsyncValidationMixin, serializers.Serializer):
     mobile = serializers.CharField(required=True)
     password = serializers.CharField(required=True)
 
@@ -53,6 +63,15 @@ class LoginSerializer(serializers.Serializer):
         except ObjectDoesNotExist:
             raise serializers.ValidationError({'mobile': [_(f"User with mobile {mobile} does not exist")]})
 
+    async def avalidate(self, attrs):
+        mobile = attrs['mobile']
+        try:
+            user = await auth_utils.aget_user_by_mobile(mobile)
+            auth_utils.validate_user(user)
+            return attrs
+        except ObjectDoesNotExist:
+            raise serializers.ValidationError({'mobile': [_(f"User with mobile {mobile} does not exist")]})
+
 
 class PasswordChangeSerializer(serializers.Serializer):
     old_password = serializers.CharField()
@@ -68,7 +87,7 @@ class PasswordChangeSerializer(serializers.Serializer):
         return attrs
 
 
-class ForgetPassSerializer(serializers.Serializer):
+class ForgetPassSerializer(AsyncValidationMixin, serializers.Serializer):
     mobile = serializers.CharField()
 
     def validate(self, attrs):
@@ -80,6 +99,15 @@ class ForgetPassSerializer(serializers.Serializer):
         except ObjectDoesNotExist:
             raise serializers.ValidationError({'mobile': [_(f"User with mobile {mobile} does not exist"), ]})
 
+    async def avalidate(self, attrs):
+        mobile = attrs['mobile']
+        try:
+            user = await auth_utils.aget_user_by_mobile(mobile)
+            auth_utils.validate_user(user)
+            return attrs
+        except ObjectDoesNotExist:
+            raise serializers.ValidationError({'mobile': [_(f"User with mobile {mobile} does not exist"), ]})
+
 
 class ForgetPassConfirmSerializer(serializers.Serializer):
     mobile = serializers.CharField()
@@ -91,7 +119,7 @@ class ForgetPassConfirmSerializer(serializers.Serializer):
         code = attrs['code']
         try:
             user = auth_utils.get_user_by_mobile(mobile)
-            if not otp_utils.is_code_valid(user, code):
+            if not otp_utils.verify_code(user, code):
                 raise serializers.ValidationError({'code': [_("Invalid code"), ]})
             return attrs
         except ObjectDoesNotExist:
@@ -101,30 +129,26 @@ class ForgetPassConfirmSerializer(serializers.Serializer):
 class AccountVerifySerializer(serializers.Serializer):
     mobile = serializers.CharField()
     code = serializers.CharField()
+    consume_code = True
 
     def validate(self, attrs):
         mobile = attrs['mobile']
         code = attrs['code']
         try:
             user = auth_utils.get_user_by_mobile(mobile)
-            if not otp_utils.is_code_valid(user, code):
+            if not otp_utils.verify_code(user, code, consume=self.consume_code):
                 raise serializers.ValidationError({'code': [_("Invalid code"), ]})
             return attrs
         except ObjectDoesNotExist:
             raise serializers.ValidationError({'mobile': [_(f"User with mobile {mobile} does not exist"), ]})
 
 
-class ResendVerificationSerializer(serializers.Serializer):
-    mobile = serializers.CharField()
+class OTPCheckSerializer(AccountVerifySerializer):
+    consume_code = False
 
-    def validate(self, attrs):
-        mobile = attrs['mobile']
-        try:
-            user = auth_utils.get_user_by_mobile(mobile)
-            auth_utils.validate_user(user)
-            return attrs
-        except ObjectDoesNotExist:
-            raise serializers.ValidationError({'mobile': [_(f"User with mobile {mobile} does not exist"), ]})
+
+class ResendVerificationSerializer(ForgetPassSerializer):
+    pass
 
 
 class ProfileSerializer(serializers.ModelSerializer):
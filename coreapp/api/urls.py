@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework import routers
 
@@ -6,16 +7,25 @@ from . import views
 router = routers.DefaultRouter()
 router.register(r'country', views.CountryAPI)
 
+if settings.ASYNC_VIEWS:
+    signup_view, resend_verification_view = views.AsyncSignupAPI, views.AsyncResendVerificationAPI
+    forget_password_view = views.AsyncForgetPasswordAPI
+    login_view, change_password_view = views.AsyncLoginView, views.AsyncPasswordChangeAPI
+else:
+    signup_view, resend_verification_view = views.SignupAPI, views.ResendVerificationAPI
+    forget_password_view = views.ForgetPasswordAPI
+    login_view, change_password_view = views.LoginView, views.PasswordChangeAPI
+
 urlpatterns = [
-    path('signup/', views.SignupAPI.as_view(), name='signup'),
-    path('login/', views.LoginView.as_view(), name='login'),
+    path('signup/', signup_view.as_view(), name='signup'),
+    path('login/', login_view.as_view(), name='login'),
     path('delete/', views.DeleteAccountAPI.as_view(), name='delete-account'),
     path('profile/', views.ProfileAPI.as_view(), name='profile'),
-    path('verification/resend/', views.ResendVerificationAPI.as_view(), name='resend-verification'),
+    path('verification/resend/', resend_verification_view.as_view(), name='resend-verification'),
     path('verification/check/', views.OTPCheckAPI.as_view(), name='otp-check'),
     path('account/verify/', views.AccountVerifyAPI.as_view(), name='account-verify'),
-    path('change/password/', views.PasswordChangeAPI.as_view(), name='change-password'),
-    path('forget/password/', views.ForgetPasswordAPI.as_view(), name='forget-password'),
+    path('change/password/', change_password_view.as_view(), name='change-password'),
+    path('forget/password/', forget_password_view.as_view(), name='forget-password'),
     path('forget/password/confirm/', views.ForgetPasswordConfirmAPI.as_view(), name='forget-password-confirm'),
     path('documents/upload/', views.UploadDocumentsAPI.as_view(), name='forget-password-confirm'),
 ]
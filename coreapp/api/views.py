@@ -1,5 +1,5 @@
-from django.core.exceptions import ObjectDoesNotExist
 from django.utils.translation import gettext_lazy as _
+from asgiref.sync import sync_to_async
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 from rest_framework.permissions import AllowAny, DjangoModelPermissionsOrAnonReadOnly
@@ -9,11 +9,13 @@ from rest_framework.viewsets import ModelViewSet
 
 from . import serializers
 from .. import email_utils, pagination
-from ..utils import auth_utils, otp_utils
-from ..models import Country, LoginHistory
+from ..mixins import ConditionalGetMixin, RelatedLoadingMixin, StreamingListMixin, ValuesListMixin
+from ..utils import auth_utils, hasher_utils, login_history_utils, otp_utils
+from ..models import Country, User
+from ..views import AsyncAPIView
 
 
-class CountryAPI(ModelViewSet):
+class CountryAPI(ConditionalGetMixin, RelatedLoadingMixin, StreamingListMixin, ValuesListMixin, ModelViewSet):
     permission_classes = [DjangoModelPermissionsOrAnonReadOnly, ]
     serializer_class = serializers.CountrySerializer
     pagination_class = pagination.LargeResultsSetPagination
@@ -40,8 +42,30 @@ class SignupAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class AsyncSignupAPI(SignupAPI, AsyncAPIView):
+    authentication_classes = []
+
+    @extend_schema(
+        request=serializers.SignupSerializer,
+        responses={201: serializers.SignupSerializer},
+    )
+    async def post(self, request):
+        serializer = serializers.SignupSerializer(
+            data=request.data, context={"request": self.request}
+        )
+        # The unique email / mobile and country checks are DRF validators on the sync ORM
+        if await sync_to_async(serializer.is_valid)():
+            user = serializer.instance = await serializer.acreate(dict(serializer.validated_data))
+            ip, user_agent = auth_utils.get_client_info(request)
+            user_confirmation = await otp_utils.acreate_user_confirmation(user, ip)
+            await otp_utils.asend_otp(user_confirmation)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class LoginView(APIView):
     permission_classes = [AllowAny, ]
+    throttle_scope = 'login'
 
     @extend_schema(
         request=serializers.LoginSerializer,
@@ -54,27 +78,52 @@ class LoginView(APIView):
             password = serializer.validated_data['password']
             user = auth_utils.get_user_by_mobile(mobile)
             ip, user_agent = auth_utils.get_client_info(request)
-            login_history = LoginHistory.objects.create(
-                user=user, ip_address=ip, user_agent=user_agent
-            )
-            if user.check_password(password):
-                login_history.is_success = True
-                data = {
-                    'id': user.pk,
-                    'email': user.email,
-                    'mobile': user.mobile,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name,
-                    'image': user.get_image_url,
-                    'gender': user.gender,
-                    'wallet': user.wallet,
-                    'is_approved': user.is_approved,
-                    'is_verified': user.is_verified
-                }
-                if user.is_verified:
-                    token, created = auth_utils.regenerate_token(user=user)
-                    data['token'] = token.key
-                login_history.save()
+            is_success = hasher_utils.check_password(user, password)
+            login_history_utils.record_login(user, ip, user_agent, is_success)
+            if is_success:
+                return Response(self.get_login_data(user), status=status.HTTP_200_OK)
+            return Response({'detail': _("Invalid login credentials")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def get_login_data(self, user):
+        data = {
+            'id': user.pk,
+            'email': user.email,
+            'mobile': user.mobile,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'image': user.get_image_url,
+            'gender': user.gender,
+            'wallet': user.wallet,
+            'is_approved': user.is_approved,
+            'is_verified': user.is_verified
+        }
+        if user.is_verified:
+            token = auth_utils.regenerate_token(user=user)
+            data['token'] = token.key
+        return data
+
+
+class AsyncLoginView(LoginView, AsyncAPIView):
+    authentication_classes = []
+
+    @extend_schema(
+        request=serializers.LoginSerializer,
+        responses={200: serializers.LoginSerializer},
+    )
+    async def post(self, request, *args, **kwargs):
+        serializer = serializers.LoginSerializer(data=request.data)
+        if await serializer.ais_valid():
+            mobile = serializer.validated_data['mobile']
+            password = serializer.validated_data['password']
+            user = await auth_utils.aget_user_by_mobile(mobile)
+            ip, user_agent = auth_utils.get_client_info(request)
+            # The hash runs in the hasher pool, the event loop keeps serving other requests
+            is_success = await hasher_utils.acheck_password(user, password)
+            await login_history_utils.arecord_login(user, ip, user_agent, is_success)
+            if is_success:
+                # The image url and token upsert use the sync ORM
+                data = await sync_to_async(self.get_login_data)(user)
                 return Response(data, status=status.HTTP_200_OK)
             return Response({'detail': _("Invalid login credentials")}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -88,12 +137,33 @@ class PasswordChangeAPI(APIView):
     def post(self, request):
         serializer = serializers.PasswordChangeSerializer(data=request.data, context={"request": self.request})
         if serializer.is_valid():
-            user = self.request.user
+            # request.user may be a cached copy, only the password is written
+            user = User.objects.get(pk=self.request.user.pk)
+            old_password = serializer.validated_data['old_password']
+            new_password = serializer.validated_data['password']
+            if hasher_utils.check_password(user, old_password):
+                hasher_utils.set_password(user, new_password)
+                user.save(update_fields=['password'])
+                return Response({"detail": _("Password Changed Successfully")}, status=status.HTTP_200_OK)
+            return Response({"detail": _("Invalid old password")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncPasswordChangeAPI(PasswordChangeAPI, AsyncAPIView):
+
+    @extend_schema(
+        request=serializers.PasswordChangeSerializer,
+        responses={200: serializers.PasswordChangeSerializer},
+    )
+    async def post(self, request):
+        serializer = serializers.PasswordChangeSerializer(data=request.data, context={"request": self.request})
+        if serializer.is_valid():
+            user = await User.objects.aget(pk=self.request.user.pk)
             old_password = serializer.validated_data['old_password']
             new_password = serializer.validated_data['password']
-            if user.check_password(old_password):
-                user.set_password(new_password)
-                user.save()
+            if await hasher_utils.acheck_password(user, old_password):
+                await hasher_utils.aset_password(user, new_password)
+                await user.asave(update_fields=['password'])
                 return Response({"detail": _("Password Changed Successfully")}, status=status.HTTP_200_OK)
             return Response({"detail": _("Invalid old password")}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -106,7 +176,8 @@ class ProfileAPI(APIView):
         responses={200: serializers.ProfileSerializer},
     )
     def post(self, request):
-        instance = self.request.user
+        # request.user may be a cached copy, saving it would write back its stale columns
+        instance = User.objects.get(pk=self.request.user.pk)
         serializer = serializers.ProfileSerializer(
             data=request.data, instance=instance,
             context={"request": self.request}
@@ -126,6 +197,7 @@ class ProfileAPI(APIView):
 
 class ForgetPasswordAPI(APIView):
     permission_classes = [AllowAny, ]
+    throttle_scope = 'forget_password'
 
     @extend_schema(
         request=serializers.ForgetPassSerializer,
@@ -143,6 +215,25 @@ class ForgetPasswordAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class AsyncForgetPasswordAPI(ForgetPasswordAPI, AsyncAPIView):
+    authentication_classes = []
+
+    @extend_schema(
+        request=serializers.ForgetPassSerializer,
+        responses={200: serializers.ForgetPassSerializer},
+    )
+    async def post(self, request):
+        serializer = serializers.ForgetPassSerializer(data=request.data, context={"request": self.request})
+        if await serializer.ais_valid():
+            mobile = serializer.validated_data['mobile']
+            user = await auth_utils.aget_user_by_mobile(mobile)
+            ip, user_agent = auth_utils.get_client_info(request)
+            user_confirmation = await otp_utils.acreate_user_confirmation(user, ip)
+            await otp_utils.asend_otp(user_confirmation)
+            return Response({'detail': _("Verification code has been sent")}, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class ForgetPasswordConfirmAPI(APIView):
     permission_classes = [AllowAny, ]
 
@@ -156,18 +247,11 @@ class ForgetPasswordConfirmAPI(APIView):
         )
         if serializer.is_valid():
             mobile = serializer.validated_data['mobile']
-            code = serializer.validated_data['code']
             password = serializer.validated_data['password']
             user = auth_utils.get_user_by_mobile(mobile)
-            try:
-                confirmation = otp_utils.get_code(user, code)
-                confirmation.is_used = True
-                confirmation.save()
-                user.set_password(password)
-                user.save()
-                return Response({'detail': _("Password has been changed")}, status=status.HTTP_200_OK)
-            except ObjectDoesNotExist:
-                return Response({"detail": "Invalid Code"}, status=status.HTTP_400_BAD_REQUEST)
+            hasher_utils.set_password(user, password)
+            user.save()
+            return Response({'detail': _("Password has been changed")}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -175,6 +259,7 @@ class DeleteAccountAPI(APIView):
     def get(self, request):
         user = self.request.user
         email_utils.send_account_deactivation_email(user.email, {})
+        # The post_delete signal drops its cached tokens in every worker
         user.delete()
         return Response({"detail": _("Account deleted successfully")}, status=status.HTTP_200_OK)
 
@@ -190,22 +275,16 @@ class AccountVerifyAPI(APIView):
         serializer = serializers.AccountVerifySerializer(data=request.data, context={"request": self.request})
         if serializer.is_valid():
             mobile = serializer.validated_data['mobile']
-            code = serializer.validated_data['code']
             user = auth_utils.get_user_by_mobile(mobile)
-            try:
-                confirmation = otp_utils.get_code(user, code)
-                user.is_verified = True
-                user.save()
-                confirmation.is_used = True
-                confirmation.save()
-                return Response({"detail": _("Account verified successfully")}, status=status.HTTP_200_OK)
-            except ObjectDoesNotExist:
-                return Response({"detail": _("Invalid Verification Code")}, status=status.HTTP_400_BAD_REQUEST)
+            user.is_verified = True
+            user.save()
+            return Response({"detail": _("Account verified successfully")}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class ResendVerificationAPI(APIView):
     permission_classes = [AllowAny, ]
+    throttle_scope = 'otp_send'
 
     @extend_schema(
         request=serializers.ResendVerificationSerializer,
@@ -223,6 +302,25 @@ class ResendVerificationAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class AsyncResendVerificationAPI(ResendVerificationAPI, AsyncAPIView):
+    authentication_classes = []
+
+    @extend_schema(
+        request=serializers.ResendVerificationSerializer,
+        responses={200: serializers.ResendVerificationSerializer},
+    )
+    async def post(self, request):
+        serializer = serializers.ResendVerificationSerializer(data=request.data, context={"request": self.request})
+        if await serializer.ais_valid():
+            mobile = serializer.validated_data['mobile']
+            user = await auth_utils.aget_user_by_mobile(mobile)
+            ip, user_agent = auth_utils.get_client_info(request)
+            user_confirmation = await otp_utils.acreate_user_confirmation(user, ip)
+            await otp_utils.asend_otp(user_confirmation)
+            return Response({'detail': _("Verification code has been sent")}, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 class UploadDocumentsAPI(APIView):
 
     @extend_schema(
@@ -241,13 +339,14 @@ class UploadDocumentsAPI(APIView):
 
 class OTPCheckAPI(APIView):
     permission_classes = [AllowAny, ]
+    throttle_scope = 'otp_check'
 
     @extend_schema(
-        request=serializers.AccountVerifySerializer,
-        responses={200: serializers.AccountVerifySerializer},
+        request=serializers.OTPCheckSerializer,
+        responses={200: serializers.OTPCheckSerializer},
     )
     def post(self, request):
-        serializer = serializers.AccountVerifySerializer(data=request.data, context={"request": self.request})
+        serializer = serializers.OTPCheckSerializer(data=request.data, context={"request": self.request})
         if serializer.is_valid():
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
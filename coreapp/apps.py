@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'coreapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .email_utils import templates
+        templates.warm()
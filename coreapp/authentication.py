@@ -0,0 +1,160 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .models import AuthToken
+from .utils import version_utils
+
+
+def get_user_version_key(user_id):
+    return f"user:version:{user_id}"
+
+
+class TokenCache:
+    """
+    Bounded in-process LRU cache of token key -> AuthToken (with its user) that expires entries after ttl seconds.
+    Each entry keeps the user's version token (see invalidate_user_tokens) read when it was stored, a hit whose
+    user has a new version in the shared cache is a miss. Keys are indexed by user id, so invalidate_user()
+    only touches that user's tokens.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, version, token = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+        # Outside the lock, the shared cache may be a network round trip away
+        if version_utils.get_version(get_user_version_key(token.user_id)) != version:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return token
+
+    def _remove(self, key):
+        """ Drop key from the entries and the user index, the lock must be held """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[2].user_id
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    def set(self, key, token, version):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, version, token)
+            self._user_keys.setdefault(token.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+token_cache = TokenCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def invalidate_user_tokens(user_id):
+    """
+    Drop the cached tokens of user_id in this worker now, and in every worker once the transaction commits by
+    replacing the user's version token. Called when the user is saved or deleted and when its token changes.
+    """
+    token_cache.invalidate_user(user_id)
+    transaction.on_commit(lambda: version_utils.bump_version(get_user_version_key(user_id)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that serves token -> user lookups from token_cache.
+    Cached entries are checked against the user's version token in the shared cache, so a user or token change
+    committed in one worker is seen by every worker on its next request.
+    Tokens stop working at expires_at, which slides forward while the token is in use.
+    """
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            try:
+                token = self.model.objects.select_related('user').get(key=key)
+            except self.model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if token.user.is_active:
+                # Read after the load, a change committed in between is seen after TOKEN_CACHE_TTL at the latest
+                token_cache.set(key, token, version_utils.get_version(get_user_version_key(token.user_id)))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        now = timezone.now()
+        if token.expires_at <= now:
+            token_cache.invalidate(key)
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        self.refresh_expiry(token, now)
+
+        # Views mutate request.user, so every request gets its own copy of the cached instance
+        return copy.copy(token.user), token
+
+    def refresh_expiry(self, token, now):
+        """ Push expires_at back to a full AUTH_TOKEN_TTL, writing at most once per AUTH_TOKEN_REFRESH_INTERVAL """
+        ttl = timedelta(seconds=settings.AUTH_TOKEN_TTL)
+        if token.expires_at - now > ttl - timedelta(seconds=settings.AUTH_TOKEN_REFRESH_INTERVAL):
+            return
+        token.expires_at = now + ttl
+        self.model.objects.filter(pk=token.pk).update(expires_at=token.expires_at)
@@ -1,9 +1,12 @@
 import itertools
 
 from django.contrib.admin.utils import NestedObjects
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
 from django.db import DEFAULT_DB_ALIAS
 from django.db import models
-from rest_framework import serializers
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 
 def get_related_objects(obj):
@@ -38,6 +41,292 @@ class RelatedFieldAlternative(serializers.PrimaryKeyRelatedField):
         return super().to_representation(instance)
 
 
+# Serializer fields whose to_representation() returns the database value unchanged
+VALUES_PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ReadOnlyField,
+)
+# Serializer fields that only format the database value (dates, decimals, uuids, choices)
+VALUES_CONVERTED_FIELDS = (
+    serializers.DateTimeField, serializers.DateField, serializers.TimeField, serializers.DecimalField,
+    serializers.FloatField, serializers.UUIDField, serializers.ChoiceField,
+)
+
+
+def get_datetime_converter(field):
+    """
+    DateTimeField.to_representation() with the timezone and output format looked up once instead of per value,
+    for the common case of aware datetimes rendered as ISO 8601
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if type(field) is not serializers.DateTimeField or field_timezone is None or output_format is None \
+            or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return convert
+
+
+class ValuesPlan:
+    """ Column list for queryset.values() and the (field name, column, converter) triples to build each row """
+
+    def __init__(self, columns, fields):
+        self.columns = columns
+        self.fields = fields
+
+    def to_representation(self, row):
+        ret = {}
+        for field_name, column, convert in self.fields:
+            value = row[column]
+            ret[field_name] = value if value is None or convert is None else convert(value)
+        return ret
+
+
+def get_values_plan(serializer):
+    """
+    Compile a read-only ModelSerializer into a ValuesPlan, so rows can be read with .values() and turned into
+    dicts without building model instances. Every readable field must map to a concrete column of the model,
+    through its source or through Meta.values_sources = {field_name: (lookup, converter or None)} for computed
+    fields. Returns None when any field can't (method fields, nested serializers, dotted or '*' sources,
+    files, many to many), the caller then uses the normal serializer path.
+    """
+    meta = getattr(serializer, 'Meta', None)
+    model = getattr(meta, 'model', None)
+    if model is None:
+        return None
+    values_sources = getattr(meta, 'values_sources', {})
+    columns, fields = [], []
+    for field in serializer._readable_fields:
+        if field.field_name in values_sources:
+            column, convert = values_sources[field.field_name]
+        else:
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None or type(field) is not serializers.PrimaryKeyRelatedField:
+                    return None
+                convert = None
+            elif isinstance(field, serializers.DateTimeField):
+                convert = get_datetime_converter(field)
+            elif isinstance(field, VALUES_CONVERTED_FIELDS):
+                convert = field.to_representation
+            elif isinstance(field, VALUES_PASSTHROUGH_FIELDS):
+                convert = None
+            else:
+                return None
+            column = field.source
+            try:
+                model_field = model._meta.get_field(column)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.many_to_many or isinstance(model_field, models.FileField):
+                return None
+        columns.append(column)
+        fields.append((field.field_name, column, convert))
+    return ValuesPlan(columns, fields)
+
+
+def depends_on(*lookups):
+    """
+    Declare the fields and relations a model property or cached_property reads, as lookups relative to the model,
+    so get_related_lookups() can load them together with the queryset and sparse fieldsets keep their columns:
+
+        @cached_property
+        @depends_on('thumbnail')
+        def get_thumbnail_url(self): ...
+    """
+
+    def decorator(func):
+        func.depends_on = lookups
+        return func
+
+    return decorator
+
+
+def get_attribute_dependencies(model, name):
+    attribute = getattr(model, name, None)
+    func = getattr(attribute, 'func', None) or getattr(attribute, 'fget', None)
+    return getattr(func, 'depends_on', ())
+
+
+def _resolve_lookup(model, parts, prefix, many, select, prefetch):
+    """
+    Walk a source (or a depends_on lookup) from model, adding every relation crossed to select (forward single
+    relations) or prefetch (from the first many relation on). Returns (model, prefix, many) at the end of the
+    path when it ends on a relation, None otherwise.
+    """
+    for part in parts:
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            for lookup in get_attribute_dependencies(model, part):
+                _resolve_lookup(model, lookup.split('__'), prefix, many, select, prefetch)
+            return None
+        if not field.is_relation:
+            return None
+        prefix = prefix + (part,)
+        many = many or field.many_to_many or field.one_to_many
+        (prefetch if many else select).add('__'.join(prefix))
+        model = field.related_model
+    return model, prefix, many
+
+
+def _collect_lookups(serializer, model, prefix, many, select, prefetch):
+    for field in serializer._readable_fields:
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if field.source == '*':
+            if isinstance(nested, serializers.BaseSerializer):
+                _collect_lookups(nested, model, prefix, many, select, prefetch)
+            continue
+        if isinstance(field, serializers.RelatedField) and field.use_pk_only_optimization() \
+                and len(field.source_attrs) == 1:
+            # Only the local <name>_id column is read
+            continue
+        target = _resolve_lookup(model, field.source_attrs, prefix, many, select, prefetch)
+        if target is not None and isinstance(nested, serializers.BaseSerializer):
+            _collect_lookups(nested, *target, select, prefetch)
+
+
+def get_related_lookups(serializer, model=None):
+    """
+    select_related and prefetch_related lookups needed to serialize instances of model (Meta.model by default)
+    without a query per row: relations named by dotted sources and nested serializers, and the relations
+    model properties declare with depends_on(). Takes a serializer class or instance.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer(context={})
+    model = model or serializer.Meta.model
+    select, prefetch = set(), set()
+    _collect_lookups(serializer, model, (), False, select, prefetch)
+    return sorted(select), sorted(prefetch)
+
+
+def get_read_columns(serializer, model=None):
+    """
+    Names of the model's local columns the serializer's readable fields read, through their source or the
+    depends_on() hint of a property. None when that can't be known (a '*' source or a property without a hint).
+    """
+    model = model or serializer.Meta.model
+    columns = {model._meta.pk.name}
+    for field in serializer._readable_fields:
+        if not field.source_attrs:
+            return None
+        name = field.source_attrs[0]
+        try:
+            names = [model._meta.get_field(name).name]
+        except FieldDoesNotExist:
+            lookups = get_attribute_dependencies(model, name)
+            if not lookups:
+                return None
+            names = [lookup.split('__')[0] for lookup in lookups]
+        for name in names:
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            # Reverse and many to many relations only need the primary key
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(name)
+    return columns
+
+
+def optimize_queryset(queryset, serializer, context=None):
+    """
+    Add the select_related / prefetch_related lookups the serializer (class or instance) needs, and with a
+    SparseFieldsMixin serializer narrowed by ?fields= / ?omit=, .only() / .defer() the columns nothing reads
+    """
+    if isinstance(serializer, type):
+        serializer = serializer(context=context or {})
+    select, prefetch = get_related_lookups(serializer, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    omitted_fields = getattr(serializer, 'omitted_fields', None)
+    if omitted_fields or getattr(serializer, 'sparse_only', False):
+        columns = get_read_columns(serializer, queryset.model)
+        if columns is None:
+            return queryset
+        if serializer.sparse_only:
+            return queryset.only(*columns)
+        deferred = set()
+        for field_name, field in omitted_fields.items():
+            try:
+                model_field = queryset.model._meta.get_field(field.source or field_name)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.is_relation and model_field.name not in columns:
+                deferred.add(model_field.name)
+        if deferred:
+            queryset = queryset.defer(*sorted(deferred))
+    return queryset
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets on GET requests: ?fields=a,b keeps only those fields, ?omit=c,d drops
+    those. Only the top level serializer is narrowed, unknown names are ignored. optimize_queryset() (and so
+    coreapp.mixins.RelatedLoadingMixin) turns them into .only() / .defer(), and a ValuesPlan only reads the
+    remaining columns.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_sparse_params(self):
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None, None
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        if parent is not None:
+            return None, None
+
+        def get_names(param):
+            value = request.query_params.get(param)
+            return {name.strip() for name in value.split(',') if name.strip()} if value else None
+
+        return get_names(self.fields_query_param), get_names(self.omit_query_param)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, omit = self.get_sparse_params()
+        self.sparse_only = only is not None
+        self.omitted_fields = {}
+        for field_name in list(fields):
+            if (only is not None and field_name not in only) or (omit and field_name in omit):
+                self.omitted_fields[field_name] = fields.pop(field_name)
+        return fields
+
+
+class AsyncValidationMixin:
+    """
+    Serializer mixin for async views: ais_valid() runs field validation like is_valid(), then awaits
+    avalidate(attrs) instead of calling validate(), so object level checks can use the async ORM.
+    Field validation must not touch the database (no unique validators or related fields).
+    """
+
+    async def avalidate(self, attrs):
+        return attrs
+
+    async def ais_valid(self, raise_exception=False):
+        assert hasattr(self, 'initial_data'), 'Cannot call `.ais_valid()` without passing a `data=` keyword argument.'
+        if not hasattr(self, '_validated_data'):
+            try:
+                value = self.to_internal_value(self.initial_data)
+                self.run_validators(value)
+                self._validated_data = await self.avalidate(value)
+            except (serializers.ValidationError, DjangoValidationError) as exc:
+                self._validated_data = {}
+                self._errors = serializers.as_serializer_error(exc)
+            else:
+                self._errors = {}
+        if self._errors and raise_exception:
+            raise serializers.ValidationError(self.errors)
+        return not bool(self._errors)
+
+
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True, db_index=True)
@@ -1,33 +1,208 @@
+import atexit
+import logging
+import os
+import queue
 import threading
+import time
 
 from decouple import config
-from django.core.mail import EmailMultiAlternatives
-from django.template import Template
-from django.template.loader import render_to_string
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import Context, Template, TemplateDoesNotExist
+from django.template.loader import get_template
 from django.utils.html import strip_tags
 from django.utils.translation import gettext_lazy as _
 
-
-class EmailThread(threading.Thread):
-    def __init__(self, msg):
-        self.msg = msg
-        threading.Thread.__init__(self)
-
-    def run(self):
-        self.msg.send()
+logger = logging.getLogger('django')
+
+EMAIL_TEMPLATES = (
+    "email/auth/welcome_email.html",
+    "email/auth/forget_password.html",
+    "email/auth/verify_your_account.html",
+    "email/auth/account_deactivated.html",
+    "email/auth/pending_approval.html",
+)
+
+
+class EmailDispatcher:
+    """
+    Bounded pool of worker threads delivering queued messages. Each worker takes up to batch_size messages at a
+    time and sends them over its own mail connection, kept open while there is work. A failed batch is retried
+    with exponential backoff from the first message that was not sent. When the queue is full, send() blocks
+    for up to queue_timeout seconds and then delivers the message itself.
+    """
+
+    def __init__(self, workers, queue_size, batch_size, max_retries, retry_backoff, queue_timeout, idle_timeout):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue_timeout = queue_timeout
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._lock:
+            if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'email-worker-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def send(self, msg):
+        self._ensure_started()
+        try:
+            self._queue.put(msg, timeout=self.queue_timeout)
+        except queue.Full:
+            logger.warning("Email queue is full, sending synchronously")
+            with get_connection() as connection:
+                self._deliver(connection, [msg])
+
+    def _take_batch(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _deliver(self, connection, batch):
+        sent = 0
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Opening explicitly keeps the session alive, send_messages() closes connections it opened itself
+                connection.open()
+                # One message per call, so a retry resumes after the last message that went out
+                while sent < len(batch):
+                    connection.send_messages(batch[sent:sent + 1])
+                    sent += 1
+                return True
+            except Exception:
+                connection.close()
+                if attempt == self.max_retries:
+                    logger.exception(
+                        f"Failed to send {len(batch) - sent} of {len(batch)} emails after {attempt + 1} attempts"
+                    )
+                    return False
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _run(self):
+        connection = get_connection()
+        while not self._stop.is_set():
+            batch = self._take_batch(self.idle_timeout)
+            if not batch:
+                # Idle, don't keep the SMTP session open until the server drops it
+                connection.close()
+                continue
+            try:
+                self._deliver(connection, batch)
+            finally:
+                for msg in batch:
+                    self._queue.task_done()
+        connection.close()
+
+    def flush(self):
+        """ Block until every queued message has been handed to the backend """
+        if self._pid == os.getpid() and any(thread.is_alive() for thread in self._threads):
+            self._queue.join()
+
+    def stop(self):
+        self.flush()
+        self._stop.set()
+        if self._pid == os.getpid():
+            for thread in self._threads:
+                thread.join(timeout=self.idle_timeout + 1)
+
+
+dispatcher = EmailDispatcher(
+    workers=settings.EMAIL_WORKERS,
+    queue_size=settings.EMAIL_QUEUE_SIZE,
+    batch_size=settings.EMAIL_BATCH_SIZE,
+    max_retries=settings.EMAIL_MAX_RETRIES,
+    retry_backoff=settings.EMAIL_RETRY_BACKOFF,
+    queue_timeout=settings.EMAIL_QUEUE_TIMEOUT,
+    idle_timeout=settings.EMAIL_IDLE_TIMEOUT,
+)
+atexit.register(dispatcher.stop)
+
+
+class EmailTemplateCache:
+    """
+    Compiled html and plain text templates of every email, loaded once. "email/x.html" is paired with
+    "email/x.txt" for the text part, strip_tags() is only used for templates without a .txt sibling.
+    """
+
+    def __init__(self, template_names):
+        self.template_names = template_names
+        self._templates = {}
+
+    def warm(self):
+        for template_name in self.template_names:
+            self.get(template_name)
+
+    def get(self, template_name):
+        templates = self._templates.get(template_name)
+        if templates is None:
+            html_template = get_template(template_name).template
+            try:
+                text_template = get_template(f"{os.path.splitext(template_name)[0]}.txt").template
+            except TemplateDoesNotExist:
+                text_template = None
+            templates = self._templates[template_name] = (html_template, text_template)
+        return templates
+
+    def render_many(self, template_name, contexts):
+        """ Render (text, html) for every context, reusing one Context object for the whole batch """
+        html_template, text_template = self.get(template_name)
+        context = Context()
+        rendered = []
+        for data in contexts:
+            with context.push(data):
+                html_content = html_template.render(context)
+                text_content = text_template.render(context) if text_template else strip_tags(html_content)
+            rendered.append((text_content, html_content))
+        return rendered
+
+    def render(self, template_name, data):
+        return self.render_many(template_name, [data])[0]
+
+
+templates = EmailTemplateCache(EMAIL_TEMPLATES)
 
 
 def generate_template(template_content):
     return Template(template_content)
 
 
-def send_email(subject, to, data, template):
-    html_content = render_to_string(template, {'data': data})
-    text_content = strip_tags(html_content)
-    from_email = config('EMAIL_HOST_USER')
-    msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
+def build_email(subject, to, text_content, html_content):
+    msg = EmailMultiAlternatives(subject, text_content, config('EMAIL_HOST_USER'), [to])
     msg.attach_alternative(html_content, "text/html")
-    EmailThread(msg).start()
+    return msg
+
+
+def send_email(subject, to, data, template):
+    text_content, html_content = templates.render(template, {'data': data})
+    dispatcher.send(build_email(subject, to, text_content, html_content))
+
+
+def send_mass_email(subject, recipients, template):
+    """ Render and queue one email per (email, data) pair of recipients in a single rendering pass """
+    recipients = list(recipients)
+    rendered = templates.render_many(template, ({'data': data} for email, data in recipients))
+    for (email, data), (text_content, html_content) in zip(recipients, rendered):
+        dispatcher.send(build_email(subject, email, text_content, html_content))
 
 
 def send_welcome_email(email, data):
@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import path
+
+from coreapp.api import views as coreapp_views
+from coreapp.models import Country, User
+from coreapp.utils import otp_utils
+from utility.api.mobile import views as utility_views
+
+
+def unthrottled(view):
+    return type(view.__name__, (view,), {'throttle_classes': []})
+
+
+def build_urlconf(info_view, forget_password_view):
+    class URLConf:
+        urlpatterns = [
+            path('info/', unthrottled(info_view).as_view()),
+            path('forget/password/', unthrottled(forget_password_view).as_view()),
+        ]
+
+    return URLConf
+
+
+SYNC_URLCONF = build_urlconf(utility_views.InfoAPI, coreapp_views.ForgetPasswordAPI)
+ASYNC_URLCONF = build_urlconf(utility_views.AsyncInfoAPI, coreapp_views.AsyncForgetPasswordAPI)
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/sec and p99 latency of the sync views under WSGI and their async variants under ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def get_host(self):
+        hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+        return hosts[0] if hosts else 'testserver'
+
+    def run_wsgi(self, method, url, data, total, concurrency):
+        client = Client(HTTP_HOST=self.get_host())
+        latencies = []
+
+        def request(_):
+            started = time.perf_counter()
+            response = client.generic(method, url, data, content_type='application/json')
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.content
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(request, range(total)))
+        return total / (time.perf_counter() - started), latencies
+
+    async def run_asgi(self, method, url, data, total, concurrency):
+        client = AsyncClient(headers={'host': self.get_host()})
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.generic(method, url, data, content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.content
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(total)))
+        return total / (time.perf_counter() - started), latencies
+
+    def create_user(self):
+        """ A verified user that only exists for the run, so no real user's OTP is replaced """
+        country = Country.objects.first()
+        if country is None:
+            return None
+        key = uuid.uuid4().hex[:12]
+        user = User(
+            first_name='Benchmark', last_name='User', email=f'benchmark-{key}@example.invalid', mobile=f'bench-{key}',
+            dob=datetime.date(2000, 1, 1), country=country, is_verified=True, is_approved=True,
+        )
+        user.set_unusable_password()
+        user.save()
+        return user
+
+    def handle(self, *args, **options):
+        total, concurrency = options['requests'], options['concurrency']
+        endpoints = [('GET', '/info/', '')]
+        user = self.create_user()
+        if user is not None:
+            endpoints.append(('POST', '/forget/password/', f'{{"mobile": "{user.mobile}"}}'))
+        else:
+            self.stderr.write("No country to create the benchmark user with, skipping forget/password/")
+
+        self.stdout.write(f"{'endpoint':<24} {'server':<6} {'views':<6} {'req/sec':>9} {'p99 ms':>8}")
+        try:
+            # Audit rows are written inline, so none is still queued when the user is deleted
+            with override_settings(AUDIT_ASYNC=False):
+                self.run_endpoints(endpoints, total, concurrency)
+        finally:
+            if user is not None:
+                cache.delete_many([otp_utils.get_code_key(user), otp_utils.get_attempts_key(user)])
+                # Cascades to its UserConfirmation rows
+                user.delete()
+
+    def run_endpoints(self, endpoints, total, concurrency):
+        for method, url, data in endpoints:
+            for server, views, urlconf in (('wsgi', 'sync', SYNC_URLCONF), ('asgi', 'sync', SYNC_URLCONF),
+                                           ('asgi', 'async', ASYNC_URLCONF)):
+                with override_settings(ROOT_URLCONF=urlconf):
+                    for _ in range(2):  # the first round warms up
+                        if server == 'wsgi':
+                            rate, latencies = self.run_wsgi(method, url, data, total, concurrency)
+                        else:
+                            rate, latencies = asyncio.run(self.run_asgi(method, url, data, total, concurrency))
+                p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+                self.stdout.write(f"{method + ' ' + url:<24} {server:<6} {views:<6} {rate:>9.1f} {p99:>8.2f}")
@@ -0,0 +1,58 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+from coreapp.utils.hasher_utils import HasherPool, HasherSaturated
+
+PASSWORD = "benchmark-password"
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password checks (logins/sec) against PBKDF2 iteration count and hasher pool size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int_list, default=[100000, 390000, 720000])
+        parser.add_argument('--pool-sizes', type=int_list, default=[0, 2, os.cpu_count() or 1])
+        parser.add_argument('--max-pending', type=int, default=32)
+        parser.add_argument('--logins', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def run(self, check, logins, concurrency):
+        shed = 0
+
+        def login(_):
+            nonlocal shed
+            try:
+                check()
+            except HasherSaturated:
+                shed += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(login, range(logins)))
+        return (logins - shed) / (time.perf_counter() - started), shed
+
+    def handle(self, *args, **options):
+        hasher = hashers.PBKDF2PasswordHasher()
+        self.stdout.write(f"{'iterations':>10} {'pool':>5} {'logins/sec':>11} {'shed':>5}")
+        for iterations in options['iterations']:
+            encoded = hasher.encode(PASSWORD, hasher.salt(), iterations)
+            for pool_size in options['pool_sizes']:
+                if pool_size <= 0:
+                    pool = None
+                    check = lambda: hashers.verify_password(PASSWORD, encoded)  # noqa: E731
+                else:
+                    pool = HasherPool(pool_size, options['max_pending'])
+                    pool.submit(hashers.verify_password, PASSWORD, encoded).result()  # warm up the workers
+                    check = lambda: pool.submit(hashers.verify_password, PASSWORD, encoded).result()  # noqa: E731
+                rate, shed = self.run(check, options['logins'], options['concurrency'])
+                if pool is not None:
+                    pool.shutdown()
+                self.stdout.write(f"{iterations:>10} {pool_size:>5} {rate:>11.1f} {shed:>5}")
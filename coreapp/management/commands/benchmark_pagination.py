@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from coreapp.models import LoginHistory, User
+from coreapp.pagination import KeysetPagination
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = 'Compare LimitOffsetPagination and KeysetPagination latency at increasing page depth on LoginHistory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--depths', type=int_list, default=[0, 1000, 10000, 50000, 90000])
+        parser.add_argument('--page-size', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def timed(self, paginate, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            paginate()
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def handle(self, *args, **options):
+        user = User.objects.first()
+        if user is None:
+            self.stderr.write("At least one user is needed to own the synthetic login history")
+            return
+        factory = APIRequestFactory()
+        page_size = options['page_size']
+        # Synthetic rows are rolled back at the end
+        with transaction.atomic():
+            LoginHistory.objects.bulk_create(
+                (LoginHistory(user=user, ip_address='127.0.0.1', user_agent='benchmark') for _ in range(options['rows'])),
+                batch_size=5000,
+            )
+            queryset = LoginHistory.objects.all()
+            self.stdout.write(f"{'depth':>8} {'offset ms':>10} {'keyset ms':>10}")
+            for depth in options['depths']:
+                offset_request = Request(factory.get('/', {'limit': page_size, 'offset': depth}))
+
+                def offset_page():
+                    paginator = LimitOffsetPagination()
+                    return paginator.paginate_queryset(queryset.order_by('-created_at', '-pk'), offset_request)
+
+                params = {'page_size': page_size}
+                if depth:
+                    boundary = queryset.order_by('-created_at', '-pk')[depth - 1]
+                    params['cursor'] = KeysetPagination().get_cursor(boundary, reverse=False)
+                keyset_request = Request(factory.get('/', params))
+
+                def keyset_page():
+                    return KeysetPagination().paginate_queryset(queryset, keyset_request)
+
+                assert [row.pk for row in offset_page()] == [row.pk for row in keyset_page()]
+                offset_ms = self.timed(offset_page, options['repeat'])
+                keyset_ms = self.timed(keyset_page, options['repeat'])
+                self.stdout.write(f"{depth:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+            transaction.set_rollback(True)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from coreapp.throttling import get_rejection_counts
+
+
+class Command(BaseCommand):
+    help = 'Show how many requests each throttle rate has rejected'
+
+    def handle(self, *args, **kwargs):
+        for rate_name, count in get_rejection_counts().items():
+            self.stdout.write(f"{rate_name}: {count}")
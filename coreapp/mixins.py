@@ -0,0 +1,257 @@
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+from .base import get_values_plan, optimize_queryset
+from .renderers import CustomRenderer
+
+
+class EarlyResponse(Exception):
+    """ Carries a response decided in initial(), returned instead of running the handler """
+
+    def __init__(self, response):
+        self.response = response
+
+
+class NotModified(EarlyResponse):
+    pass
+
+
+class ConditionalGetMixin:
+    """
+    APIView / viewset mixin that answers GET and HEAD with 304 Not Modified before the handler runs (so before
+    any serialization) when If-None-Match / If-Modified-Since still match. The validator comes from one
+    Max('updated_at') + Count query over get_validator_queryset(): the filtered queryset on list routes,
+    the single looked up row on detail routes. Changes that don't touch updated_at of those rows, like a new
+    file on a related Document, are not seen.
+    On viewsets only conditional_actions are validated, on plain APIViews every GET is. Works with AsyncAPIView
+    too, the validator query then goes through the async ORM.
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def get_validator_queryset(self):
+        """ None when the looked up value is invalid, the handler then answers 404 as get_object_or_404 does """
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            try:
+                queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError, ValidationError):
+                return None
+        return queryset
+
+    def get_validator_aggregates(self):
+        return {'last_modified': Max('updated_at'), 'count': Count('pk')}
+
+    def build_validators(self, request, aggregate):
+        last_modified = aggregate['last_modified']
+        key = f"{request.get_full_path()}|{aggregate['count']}|{last_modified.isoformat() if last_modified else ''}"
+        return quote_etag(hashlib.md5(key.encode()).hexdigest()), last_modified
+
+    def get_validators(self, request):
+        queryset = self.get_validator_queryset()
+        if queryset is None:
+            return None, None
+        return self.build_validators(request, queryset.aggregate(**self.get_validator_aggregates()))
+
+    async def aget_validators(self, request):
+        queryset = self.get_validator_queryset()
+        if queryset is None:
+            return None, None
+        return self.build_validators(request, await queryset.aaggregate(**self.get_validator_aggregates()))
+
+    def is_conditional(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        action = getattr(self, 'action', None)
+        return action is None or action in self.conditional_actions
+
+    def check_not_modified(self, request):
+        if self.etag is None and self.last_modified is None:
+            return
+        response = get_conditional_response(
+            request, etag=self.etag,
+            last_modified=timegm(self.last_modified.utctimetuple()) if self.last_modified else None,
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag, self.last_modified = None, None
+        if self.is_conditional(request):
+            self.etag, self.last_modified = self.get_validators(request)
+            self.check_not_modified(request)
+
+    async def ainitial(self, request, *args, **kwargs):
+        # Called instead of initial() by coreapp.views.AsyncAPIView
+        await super().ainitial(request, *args, **kwargs)
+        self.etag, self.last_modified = None, None
+        if self.is_conditional(request):
+            self.etag, self.last_modified = await self.aget_validators(request)
+            self.check_not_modified(request)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == 200 and getattr(self, 'etag', None):
+            response['ETag'] = self.etag
+            if self.last_modified:
+                response['Last-Modified'] = http_date(timegm(self.last_modified.utctimetuple()))
+        return response
+
+
+class CachedResponseMixin:
+    """
+    APIView / viewset mixin that serves GET and HEAD from rendered bodies kept in response_cache (a
+    coreapp.utils.response_cache_utils.ResponseCache) without running the handler, so without touching the ORM.
+    Entries vary on the path, the media type and cache_query_params, only 200 responses are stored.
+    Invalidation is up to the owner of the cache, usually save signals calling response_cache.invalidate().
+    If-None-Match is answered from the stored ETag: with ConditionalGetMixin this mixin comes first, and cached
+    actions skip its validator query. On viewsets only cached_actions are cached, on plain APIViews every GET is.
+    """
+    response_cache = None
+    cached_actions = ()
+    cache_query_params = ('fields', 'omit')
+
+    def is_cached(self, request):
+        if self.response_cache is None or request.method not in ('GET', 'HEAD'):
+            return False
+        action = getattr(self, 'action', None)
+        return action is None or action in self.cached_actions
+
+    def is_conditional(self, request):
+        # With ConditionalGetMixin, cached actions are validated against the stored ETag instead
+        return not self.is_cached(request) and super().is_conditional(request)
+
+    def get_cache_variant(self, request):
+        params = sorted(
+            (key, value) for key in self.cache_query_params for value in request.query_params.getlist(key)
+        )
+        return f"{request.path}|{request.accepted_media_type}|{urlencode(params)}"
+
+    def build_cached_response(self, request, entry):
+        response = get_conditional_response(request, etag=entry['etag'])
+        if response is None:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        return response
+
+    def use_cache_lookup(self, request, entry, version, must_build):
+        if entry is not None:
+            raise EarlyResponse(self.build_cached_response(request, entry))
+        # Without the rebuild lock the response is built but not stored
+        self.cache_version = version if must_build else None
+
+    def initial(self, request, *args, **kwargs):
+        self.cache_variant, self.cache_version = None, None
+        super().initial(request, *args, **kwargs)
+        if self.is_cached(request):
+            self.cache_variant = self.get_cache_variant(request)
+            self.use_cache_lookup(request, *self.response_cache.lookup(self.cache_variant))
+
+    async def ainitial(self, request, *args, **kwargs):
+        # Called instead of initial() by coreapp.views.AsyncAPIView
+        self.cache_variant, self.cache_version = None, None
+        await super().ainitial(request, *args, **kwargs)
+        if self.is_cached(request):
+            self.cache_variant = self.get_cache_variant(request)
+            self.use_cache_lookup(request, *await self.response_cache.alookup(self.cache_variant))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, EarlyResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'cache_version', None) is not None:
+            if response.status_code == 200 and isinstance(response, Response):
+                response.render()
+                entry = self.response_cache.set(
+                    self.cache_variant, self.cache_version, response.content, response['Content-Type']
+                )
+                response['ETag'] = entry['etag']
+            else:
+                self.response_cache.release(self.cache_variant)
+            self.cache_version = None
+        return response
+
+
+class RelatedLoadingMixin:
+    """
+    Viewset mixin that adds the select_related / prefetch_related lookups the action's serializer needs
+    (see coreapp.base.get_related_lookups) to get_queryset(), so list routes run a constant number of queries
+    """
+
+    def get_queryset(self):
+        return optimize_queryset(super().get_queryset(), self.get_serializer())
+
+
+class StreamingListMixin:
+    """
+    Viewset mixin that answers list requests made with ?stream=true by streaming every row, read with
+    .iterator(chunk_size=stream_chunk_size) and serialized one at a time, in the usual CustomRenderer envelope.
+    Rows are read with .values() when the serializer compiles to a ValuesPlan.
+    Memory stays flat whatever the row count; pagination does not apply to streamed responses.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 2000
+    stream_buffer_size = 64 * 1024
+
+    def should_stream(self, request):
+        return request.query_params.get(self.stream_query_param, '').lower() in ('1', 'true')
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_stream(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_rows(queryset), content_type=CustomRenderer.media_type)
+
+    def stream_rows(self, queryset):
+        renderer = CustomRenderer()
+        serializer = self.get_serializer()
+        plan = get_values_plan(serializer)
+        if plan is not None:
+            queryset = queryset.prefetch_related(None).values(*plan.columns)
+            to_representation = plan.to_representation
+        else:
+            to_representation = serializer.to_representation
+        buffer = bytearray(b'{"status":"success","code":200,"data":[')
+        separator = b''
+        for row in queryset.iterator(chunk_size=self.stream_chunk_size):
+            buffer += separator + renderer.encode(to_representation(row))
+            separator = b','
+            if len(buffer) >= self.stream_buffer_size:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b'],"message":null}'
+        yield bytes(buffer)
+
+
+class ValuesListMixin:
+    """
+    Viewset mixin that serves list requests from queryset.values() when the serializer compiles to a ValuesPlan
+    (see coreapp.base.get_values_plan), skipping model instances and per field attribute lookups.
+    Serializers that can't be compiled go through the normal list().
+    """
+
+    def list(self, request, *args, **kwargs):
+        plan = get_values_plan(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*plan.columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([plan.to_representation(row) for row in page])
+        return Response([plan.to_representation(row) for row in queryset])
@@ -1,3 +1,6 @@
+import binascii
+import os
+
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
@@ -7,7 +10,7 @@ from django.utils.translation import gettext_lazy as _
 
 from coreapp import constants
 from coreapp.manager import MyUserManager
-from .base import BaseModel
+from .base import BaseModel, depends_on
 
 
 # Create your models here.
@@ -51,10 +54,12 @@ class User(AbstractBaseUser, PermissionsMixin):
         return f"{self.first_name} {self.last_name}"
 
     @cached_property
+    @depends_on('image')
     def get_image_url(self):
         return self.image.get_url if self.image_id else None
 
     @cached_property
+    @depends_on('country')
     def get_country_name(self):
         return self.country.name
 
@@ -90,3 +95,22 @@ class Document(BaseModel):
     @cached_property
     def get_url(self):
         return f"{settings.MEDIA_HOST}{self.document.url}"
+
+    @classmethod
+    def build_url(cls, name):
+        """ Same as get_url, from the stored file name (e.g. a .values() row) """
+        return f"{settings.MEDIA_HOST}{cls._meta.get_field('document').storage.url(name)}"
+
+
+class AuthToken(BaseModel):
+    """ One API token per user that expires at expires_at, replaces rest_framework.authtoken's Token """
+    key = models.CharField(max_length=40, unique=True)
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='api_token')
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.expires_at}"
+
+    @classmethod
+    def generate_key(cls):
+        return binascii.hexlify(os.urandom(20)).decode()
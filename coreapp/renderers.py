@@ -1,26 +1,54 @@
+from django.utils.functional import cached_property
 from rest_framework.renderers import JSONRenderer
-from rest_framework.response import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class CustomRenderer(JSONRenderer):
+    """
+    Wraps every response in the {status, code, data, message[, errors]} envelope.
+    The payload is encoded once, with orjson when it is installed, and the envelope bytes are written around it.
+    The data passed in is never modified.
+    """
+
+    @cached_property
+    def encoder(self):
+        return self.encoder_class(ensure_ascii=self.ensure_ascii, allow_nan=not self.strict, separators=(',', ':'))
+
+    def encode(self, data):
+        if data is None:
+            return b'null'
+        if orjson is not None:
+            ret = orjson.dumps(
+                data, default=self.encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        else:
+            ret = self.encoder.encode(data).encode()
+        # Same as JSONRenderer, keep the output a strict javascript subset
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
     def render(self, data, accepted_media_type=None, renderer_context=None):
         status_code = renderer_context['response'].status_code
         if status_code == 204:
             status_code = 200
-        response = {
-            "status": "success",
-            "code": status_code,
-            "data": data,
-            "message": None
-        }
-        if data is not None and "detail" in data:
-            response["message"] = data["detail"]
-            del data['detail']
-        if not str(status_code).startswith('2'):
-            response["status"] = "error"
-            response["data"] = None
-            try:
-                response["message"] = data["detail"]
-            except KeyError:
-                response["errors"] = data
-        return super(CustomRenderer, self).render(response, accepted_media_type, renderer_context)
+        message = None
+        if isinstance(data, dict) and "detail" in data:
+            message = data["detail"]
+            data = {key: value for key, value in data.items() if key != "detail"}
+
+        if str(status_code).startswith('2'):
+            response = {"status": "success", "code": status_code, "data": data, "message": message}
+        else:
+            response = {"status": "error", "code": status_code, "data": None, "message": message, "errors": data}
+
+        if self.get_indent(accepted_media_type, renderer_context) is not None or not self.compact:
+            return super(CustomRenderer, self).render(response, accepted_media_type, renderer_context)
+
+        ret = b'{"status":"%s","code":%d,"data":' % (response["status"].encode(), status_code)
+        ret += self.encode(response["data"]) + b',"message":' + self.encode(message)
+        if "errors" in response:
+            ret += b',"errors":' + self.encode(response["errors"])
+        return ret + b'}'
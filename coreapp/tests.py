@@ -1,3 +1,467 @@
-from django.test import TestCase
+import datetime
+import json
+import threading
+import time
+from base64 import urlsafe_b64encode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import email_utils
+from .api import views
+from .api.serializers import CountrySerializer, ProfileSerializer
+from .authentication import TokenCache, get_user_version_key, token_cache
+from .base import get_attribute_dependencies, get_read_columns, get_related_lookups, get_values_plan
+from .models import AuthToken, Country, LoginHistory, User, UserConfirmation
+from .pagination import KeysetPagination
+from .throttling import IPRateThrottle
+from .utils import audit_utils, auth_utils, http_utils, otp_utils
+from .utils.query_utils import assert_constant_queries
+from .utils.version_utils import bump_version, get_version
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.country = Country.objects.create(name='Malaysia', code='MY', phone_code='60', flag='')
+
+    def test_invalid_lookup_is_not_found(self):
+        response = self.client.get('/api/v1/auth/country/abc/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unchanged_row_is_not_modified(self):
+        response = self.client.get(f'/api/v1/auth/country/{self.country.pk}/')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f'/api/v1/auth/country/{self.country.pk}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class FlakyEmailBackend(BaseEmailBackend):
+    """ Fails once on the message at fail_at """
+
+    def __init__(self, fail_at=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_at = fail_at
+        self.sent = []
+        self.is_open = False
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if len(self.sent) == self.fail_at:
+                self.fail_at = None
+                raise ConnectionError('connection reset')
+            self.sent.append(message.subject)
+        return len(email_messages)
+
+
+class EmailDispatcherTests(SimpleTestCase):
+    def build_dispatcher(self, **kwargs):
+        options = dict(
+            workers=0, queue_size=1, batch_size=10, max_retries=2, retry_backoff=0, queue_timeout=0, idle_timeout=1
+        )
+        return email_utils.EmailDispatcher(**{**options, **kwargs})
+
+    def test_retry_resends_only_unsent_messages(self):
+        connection = FlakyEmailBackend(fail_at=2)
+        batch = [EmailMessage(subject=str(index)) for index in range(4)]
+        self.assertTrue(self.build_dispatcher()._deliver(connection, batch))
+        self.assertEqual(connection.sent, ['0', '1', '2', '3'])
+
+    def test_full_queue_fallback_closes_connection(self):
+        dispatcher = self.build_dispatcher()
+        dispatcher.send(EmailMessage(subject='queued'))
+        connection = FlakyEmailBackend()
+        with mock.patch.object(email_utils, 'get_connection', return_value=connection):
+            dispatcher.send(EmailMessage(subject='direct'))
+        self.assertEqual(connection.sent, ['direct'])
+        self.assertFalse(connection.is_open)
+
+
+class IPRateThrottleTests(SimpleTestCase):
+    def get_ident(self, num_proxies):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.7')
+        with override_settings(REST_FRAMEWORK={'NUM_PROXIES': num_proxies}):
+            return IPRateThrottle().get_ident(Request(request))
+
+    def test_forwarded_for_is_not_trusted_without_proxies(self):
+        self.assertEqual(self.get_ident(0), '10.0.0.2')
+
+    def test_proxy_hop_is_used(self):
+        self.assertEqual(self.get_ident(1), '203.0.113.7')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncPasswordViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Malaysia', code='MY', phone_code='60', flag='')
+        cls.user = User.objects.create(
+            first_name='Ali', last_name='Abu', email='ali@example.com', mobile='60123456789',
+            dob=datetime.date(1990, 1, 1), country=country, is_verified=True, is_approved=True,
+        )
+        cls.user.set_password('old-password')
+        cls.user.save()
+
+    def post(self, view, data, user=None):
+        request = APIRequestFactory().post('/', data, format='json')
+        if user is not None:
+            force_authenticate(request, user=user)
+        return async_to_sync(view.as_view())(request)
+
+    @override_settings(AUDIT_ASYNC=False)
+    def test_login(self):
+        response = self.post(views.AsyncLoginView, {'mobile': self.user.mobile, 'password': 'old-password'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.data)
+        response = self.post(views.AsyncLoginView, {'mobile': self.user.mobile, 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            list(LoginHistory.objects.filter(user=self.user).values_list('is_success', flat=True).order_by('pk')),
+            [True, False],
+        )
+
+    def test_password_change(self):
+        user = User.objects.get(pk=self.user.pk)
+        response = self.post(views.AsyncPasswordChangeAPI, {
+            'old_password': 'old-password', 'password': 'Kx8!new-password', 'confirm_password': 'Kx8!new-password',
+        }, user=user)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('Kx8!new-password'))
+
+
+class CountryListQueryTests(TestCase):
+    def test_constant_queries(self):
+        def fetch():
+            self.assertEqual(self.client.get('/api/v1/auth/country/?limit=1000').status_code, 200)
+
+        def add_countries():
+            Country.objects.bulk_create(Country(name='Malaysia', code='MY', phone_code='60', flag='') for _ in range(5))
+
+        assert_constant_queries(fetch, add_countries)
+
+
+class StreamingListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Country.objects.bulk_create(
+            Country(name=name, code=code, phone_code=phone_code, flag='')
+            for name, code, phone_code in [('Malaysia', 'MY', '60'), ('Türkiye', 'TR', '90'), ('Line\u2028break', 'LB', '0')]
+        )
+        Country.objects.create(name='Inactive', code='IN', phone_code='1', flag='', is_active=False)
+
+    def get_streamed(self):
+        # A small buffer so the body is sent in several chunks
+        with mock.patch.object(views.CountryAPI, 'stream_buffer_size', 64):
+            response = self.client.get('/api/v1/auth/country/?stream=true')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            # The rows are read while the body is consumed
+            chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        return json.loads(b''.join(chunks))
+
+    def assert_same_as_list(self):
+        response = self.client.get('/api/v1/auth/country/?limit=1000')
+        self.assertEqual(response.status_code, 200)
+        expected = json.loads(response.content)
+        expected['data'] = expected['data']['results']
+        streamed = self.get_streamed()
+        self.assertEqual(streamed, expected)
+        self.assertEqual(list(streamed), ['status', 'code', 'data', 'message'])
+        self.assertEqual(len(streamed['data']), 3)
+
+    def test_values_plan(self):
+        self.assertIsNotNone(get_values_plan(CountrySerializer()))
+        self.assertEqual(self.get_streamed()['data'][0]['name'], 'Malaysia')
+        self.assert_same_as_list()
+
+    def test_serializer(self):
+        with mock.patch('coreapp.mixins.get_values_plan', return_value=None):
+            self.assert_same_as_list()
+
+    def test_empty(self):
+        Country.objects.all().delete()
+        response = self.client.get('/api/v1/auth/country/?stream=1')
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            {'status': 'success', 'code': 200, 'data': [], 'message': None},
+        )
+
+
+class RelatedLookupTests(SimpleTestCase):
+    def test_depends_on(self):
+        self.assertEqual(get_attribute_dependencies(User, 'get_image_url'), ('image',))
+        self.assertEqual(get_attribute_dependencies(User, 'get_full_name'), ())
+
+    def test_related_lookups(self):
+        # image is read as image_id, get_image_url needs the Document
+        self.assertEqual(get_related_lookups(ProfileSerializer), (['image'], []))
+        self.assertEqual(get_related_lookups(CountrySerializer), ([], []))
+
+    def test_read_columns(self):
+        self.assertEqual(
+            get_read_columns(ProfileSerializer()), {'id', 'first_name', 'last_name', 'email', 'mobile', 'image', 'bio'}
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(
+            first_name='Ali', last_name='Abu', email='ali@example.com', mobile='60123456789',
+            dob=datetime.date(1990, 1, 1), country=Country.objects.create(name='Malaysia', code='MY'),
+        )
+        LoginHistory.objects.bulk_create(LoginHistory(user=user) for _ in range(7))
+        # Same created_at for the middle rows, only the pk orders them
+        rows = list(LoginHistory.objects.order_by('pk'))
+        now = timezone.now()
+        for index, row in enumerate(rows):
+            row.created_at = now + datetime.timedelta(seconds=min(max(index, 2), 5))
+        LoginHistory.objects.bulk_update(rows, ['created_at'])
+        cls.expected = [row.pk for row in sorted(rows, key=lambda row: (row.created_at, row.pk), reverse=True)]
+
+    def paginate(self, url):
+        paginator = KeysetPagination()
+        paginator.page_size = 3
+        page = paginator.paginate_queryset(LoginHistory.objects.all(), Request(APIRequestFactory().get(url)))
+        return [row.pk for row in page], paginator.get_next_link(), paginator.get_previous_link()
+
+    def test_next_and_previous_links(self):
+        pages, url, previous = [], '/history/', None
+        while url:
+            page, url, previous = self.paginate(url)
+            pages.append((page, previous))
+        self.assertEqual([pk for page, previous in pages for pk in page], self.expected)
+        self.assertIsNone(pages[0][1])
+        # Back from the last page
+        page, url, previous = self.paginate(pages[-1][1])
+        self.assertEqual(page, pages[-2][0])
+        page, url, previous = self.paginate(previous)
+        self.assertEqual(page, pages[0][0])
+        self.assertIsNone(previous)
+
+    def test_invalid_cursor_is_not_found(self):
+        naive = urlsafe_b64encode(f'n|{datetime.datetime(2024, 1, 1).isoformat()}|1'.encode()).decode()
+        for cursor in ('abc', '@@', urlsafe_b64encode(b'n|soon|1').decode(), naive):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginate(f'/history/?cursor={cursor}')
+
+
+class TokenCacheTests(SimpleTestCase):
+    def test_invalidate_user(self):
+        token_cache = TokenCache(max_size=3, ttl=60)
+        for index in range(4):
+            user_id = index % 2
+            token_cache.set(
+                f'key-{index}', SimpleNamespace(user_id=user_id), get_version(get_user_version_key(user_id))
+            )
+        # key-0 was evicted, its user keeps key-2 only
+        token_cache.invalidate_user(0)
+        self.assertIsNone(token_cache.get('key-2'))
+        self.assertIsNotNone(token_cache.get('key-1'))
+        self.assertIsNotNone(token_cache.get('key-3'))
+        self.assertEqual(token_cache._user_keys, {1: {'key-1', 'key-3'}})
+
+
+class CrossWorkerUserTests(TestCase):
+    """ Changes committed by another worker reach this worker only through the shared user version token """
+
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Malaysia', code='MY', phone_code='60', flag='')
+        cls.user = User.objects.create(
+            first_name='Ali', last_name='Abu', email='ali@example.com', mobile='60123456789',
+            dob=datetime.date(1990, 1, 1), country=country, is_verified=True, is_approved=True,
+        )
+        cls.token = auth_utils.regenerate_token(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {self.token.key}'
+        # Cached in this worker
+        self.assertEqual(self.client.get('/api/v1/auth/profile/').status_code, 200)
+
+    def change_in_other_worker(self, queryset, **changes):
+        # What the other worker's save does: write, then replace the version token once committed
+        queryset.update(**changes)
+        bump_version(get_user_version_key(self.user.pk))
+
+    def test_profile_save_keeps_password_changed_elsewhere(self):
+        self.change_in_other_worker(User.objects.filter(pk=self.user.pk), password=make_password('changed'))
+        response = self.client.post(
+            '/api/v1/auth/profile/', {'first_name': 'Abu', 'last_name': 'Ali', 'bio': ''}
+        )
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.first_name, 'Abu')
+        self.assertTrue(user.check_password('changed'))
+
+    def test_user_deactivated_elsewhere(self):
+        self.change_in_other_worker(User.objects.filter(pk=self.user.pk), is_active=False)
+        self.assertEqual(self.client.get('/api/v1/auth/profile/').status_code, 401)
+
+    def test_token_rotated_elsewhere(self):
+        self.change_in_other_worker(AuthToken.objects.filter(pk=self.token.pk), key='rotated')
+        self.assertEqual(self.client.get('/api/v1/auth/profile/').status_code, 401)
+
+    def test_save_replaces_version_on_commit(self):
+        version = get_version(get_user_version_key(self.user.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).save()
+        self.assertNotEqual(get_version(get_user_version_key(self.user.pk)), version)
+
+
+@override_settings(AUDIT_ASYNC=False)
+class OTPTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Malaysia', code='MY', phone_code='60', flag='')
+        cls.user = User.objects.create(
+            first_name='Ali', last_name='Abu', email='ali@example.com', mobile='60123456789',
+            dob=datetime.date(1990, 1, 1), country=country,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, url, code):
+        return self.client.post(url, {'mobile': self.user.mobile, 'code': code}).status_code
+
+    def test_code_is_single_use(self):
+        code = otp_utils.create_user_confirmation(self.user, '127.0.0.1').confirmation_code
+        self.assertEqual(self.post('/api/v1/auth/account/verify/', code), 200)
+        self.assertEqual(self.post('/api/v1/auth/account/verify/', code), 400)
+        self.assertTrue(UserConfirmation.objects.get(user=self.user).is_used)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_verified)
+
+    def test_check_does_not_consume(self):
+        code = otp_utils.create_user_confirmation(self.user, '127.0.0.1').confirmation_code
+        self.assertEqual(self.post('/api/v1/auth/verification/check/', code), 200)
+        self.assertEqual(self.post('/api/v1/auth/verification/check/', code), 200)
+        self.assertFalse(UserConfirmation.objects.get(user=self.user).is_used)
+        self.assertEqual(self.post('/api/v1/auth/account/verify/', code), 200)
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_attempt_limit_deletes_code(self):
+        code = otp_utils.create_user_confirmation(self.user, '127.0.0.1').confirmation_code
+        wrong = str((int(code) + 1) % 1000000).zfill(6)
+        for _ in range(3):
+            self.assertFalse(otp_utils.verify_code(self.user, wrong))
+        self.assertFalse(otp_utils.verify_code(self.user, code))
+        self.assertIsNone(cache.get(otp_utils.get_code_key(self.user)))
+        self.assertFalse(otp_utils.verify_code(self.user, code))
+
+    def test_missing_code_is_rejected(self):
+        self.assertFalse(otp_utils.verify_code(self.user, '123456'))
+        self.assertEqual(self.post('/api/v1/auth/verification/check/', '123456'), 400)
+
+    @override_settings(OTP_TTL=1)
+    def test_expired_code_is_rejected(self):
+        code = otp_utils.create_user_confirmation(self.user, '127.0.0.1').confirmation_code
+        time.sleep(1.1)
+        self.assertFalse(otp_utils.verify_code(self.user, code))
+
+    def test_resend_replaces_code(self):
+        with mock.patch.object(otp_utils, 'generate_code', side_effect=['111111', '222222']):
+            otp_utils.create_user_confirmation(self.user, '127.0.0.1')
+            otp_utils.create_user_confirmation(self.user, '127.0.0.1')
+        self.assertFalse(otp_utils.verify_code(self.user, '111111'))
+        self.assertTrue(otp_utils.verify_code(self.user, '222222'))
+
+
+class UnavailableHandler(BaseHTTPRequestHandler):
+    """ Answers every request with 503 and counts them per method """
+
+    def respond(self):
+        self.server.hits[self.command] = self.server.hits.get(self.command, 0) + 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProviderClientRetryTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), UnavailableHandler)
+        self.server.hits = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.provider = http_utils.ProviderClient(
+            'stub', f'http://127.0.0.1:{self.server.server_port}', connect_timeout=1, read_timeout=1,
+            max_retries=2, retry_backoff=0, pool_size=1,
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        http_utils.clients.pop('stub', None)
+
+    def test_idempotent_calls_are_retried(self):
+        self.assertEqual(self.provider.get('/bills').status_code, 503)
+        self.assertEqual(self.provider.post('/bills', idempotent=True).status_code, 503)
+        self.assertEqual(self.server.hits, {'GET': 3, 'POST': 3})
+
+    def test_other_calls_are_not_retried(self):
+        self.assertEqual(self.provider.post('/bills').status_code, 503)
+        self.assertEqual(self.server.hits, {'POST': 1})
+
+
+class AuditWriterTests(TransactionTestCase):
+    # The writer thread uses its own connection, so rows must be committed
+
+    def setUp(self):
+        self.user = User.objects.create(
+            first_name='Ali', last_name='Abu', email='ali@example.com', mobile='60123456789',
+            dob=datetime.date(1990, 1, 1), country=Country.objects.create(name='Malaysia', code='MY'),
+        )
+
+    def login_history(self, user_id=None):
+        return LoginHistory(user_id=user_id or self.user.pk, ip_address='127.0.0.1', user_agent='test')
+
+    def test_stop_drains_the_queue(self):
+        writer = audit_utils.AuditWriter(batch_size=3, flush_interval=0.05, max_queue_size=100)
+        for _ in range(10):
+            writer.put(self.login_history())
+        writer.stop()
+        self.assertEqual(LoginHistory.objects.count(), 10)
+
+    def test_flush_writes_from_the_calling_thread(self):
+        writer = audit_utils.AuditWriter(batch_size=100, flush_interval=60, max_queue_size=100)
+        # Not started, so nothing but flush() takes the rows
+        writer._queue.put_nowait(self.login_history())
+        writer._queue.put_nowait(self.login_history())
+        writer.flush()
+        self.assertEqual(LoginHistory.objects.count(), 2)
+
+    def test_bad_row_does_not_drop_the_batch(self):
+        writer = audit_utils.AuditWriter(batch_size=100, flush_interval=60, max_queue_size=100)
+        writer._write([self.login_history(), self.login_history(user_id=self.user.pk + 1000), self.login_history()])
+        self.assertEqual(LoginHistory.objects.count(), 2)
+
+    @override_settings(AUDIT_ASYNC=False)
+    def test_inline_write(self):
+        login_history = self.login_history()
+        audit_utils.write(login_history)
+        self.assertIsNotNone(login_history.pk)
+        self.assertTrue(LoginHistory.objects.filter(pk=login_history.pk).exists())
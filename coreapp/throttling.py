@@ -0,0 +1,98 @@
+import hashlib
+import logging
+
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger('django')
+
+
+def get_rejection_key(rate_name):
+    return f"throttle:rejected:{rate_name}"
+
+
+def get_rejection_counts():
+    """ Rejected requests per rate name, shared by every worker through the cache """
+    rate_names = list(SimpleRateThrottle.THROTTLE_RATES)
+    counts = cache.get_many([get_rejection_key(rate_name) for rate_name in rate_names])
+    return {rate_name: counts.get(get_rejection_key(rate_name), 0) for rate_name in rate_names}
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Sliding window counter keyed by the view's throttle_scope and an identity (see get_ident).
+    The rate comes from DEFAULT_THROTTLE_RATES["<throttle_scope>_<kind>"], views without one are not throttled.
+    Counting uses cache.add/cache.incr so it is atomic on a shared cache, and runs in APIView.initial(),
+    before the serializer touches the database.
+    """
+    kind = None
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request()
+        pass
+
+    def get_ident(self, request):
+        raise NotImplementedError('.get_ident() must be overridden')
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+        self.scope = f"{scope}_{self.kind}"
+        self.rate = self.THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        ident = self.get_ident(request)
+        if not ident:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        key = self.cache_format % {'scope': self.scope, 'ident': ident}
+        current_key, previous_key = f"{key}:{window}", f"{key}:{window - 1}"
+        self.cache.add(current_key, 0, self.duration * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            self.cache.set(current_key, 1, self.duration * 2)
+            current = 1
+        previous = self.cache.get(previous_key, 0)
+        elapsed = (self.now % self.duration) / self.duration
+        if previous * (1 - elapsed) + current > self.num_requests:
+            return self.throttle_failure()
+        return True
+
+    def throttle_failure(self):
+        rejection_key = get_rejection_key(self.scope)
+        self.cache.add(rejection_key, 0, None)
+        try:
+            self.cache.incr(rejection_key)
+        except ValueError:
+            pass
+        logger.warning(f"Throttled request on {self.scope}")
+        return False
+
+    def wait(self):
+        return self.duration - (self.now % self.duration)
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    kind = 'ip'
+
+    def get_ident(self, request):
+        # DRF's client address: REMOTE_ADDR, or the X-Forwarded-For entry added by the NUM_PROXIES trusted proxies.
+        # The first X-Forwarded-For entry is set by the client, so it could dodge the limit.
+        return SimpleRateThrottle.get_ident(self, request)
+
+
+class MobileRateThrottle(SlidingWindowThrottle):
+    kind = 'mobile'
+
+    def get_ident(self, request):
+        mobile = request.data.get('mobile') if hasattr(request.data, 'get') else None
+        if not mobile:
+            return None
+        # Hashed, as client input is not a safe cache key (length, whitespace)
+        return hashlib.sha256(str(mobile).strip().encode()).hexdigest()
@@ -0,0 +1,152 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+logger = logging.getLogger('django')
+
+
+class AuditWriter:
+    """
+    Queues audit rows in memory and writes them with bulk_create (one per model) from a background thread,
+    whenever batch_size items are pending or flush_interval seconds have passed. A batch that fails on an
+    IntegrityError is written again row by row, so only the bad rows are lost. Callables may be queued too, they run after the rows of their batch are inserted.
+    """
+
+    def __init__(self, batch_size, flush_interval, max_queue_size):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # The worker is started lazily (and restarted after a fork) so preloading app servers get one per process
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def offer(self, item):
+        """ Queue item without blocking, returns False when the queue is full """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning("Audit queue is full, writing synchronously")
+            return False
+        return True
+
+    def put(self, item):
+        if not self.offer(item):
+            _write_now(item)
+
+    def _take_batch(self, timeout):
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        rows = defaultdict(list)
+        jobs = []
+        for item in batch:
+            if callable(item):
+                jobs.append(item)
+            else:
+                rows[item.__class__].append(item)
+        for model, objs in rows.items():
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create(objs)
+            except IntegrityError:
+                # One bad row (e.g. its user was deleted meanwhile) must not drop the whole batch
+                self._write_each(model, objs)
+            except Exception:
+                logger.exception(f"Failed to write {len(objs)} {model.__name__} audit records")
+        for job in jobs:
+            try:
+                job()
+            except Exception:
+                logger.exception("Audit job failed")
+
+    def _write_each(self, model, objs):
+        for obj in objs:
+            try:
+                with transaction.atomic():
+                    obj.save()
+            except Exception:
+                logger.exception(f"Failed to write a {model.__name__} audit record")
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(self.flush_interval)
+            if batch:
+                self._write(batch)
+                connection.close()
+
+    def flush(self):
+        """ Write everything that is currently queued from the calling thread """
+        while True:
+            batch = self._take_batch(timeout=0)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+
+def _write_now(item):
+    if callable(item):
+        item()
+    else:
+        item.save()
+
+
+writer = AuditWriter(
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    max_queue_size=settings.AUDIT_QUEUE_SIZE,
+)
+atexit.register(writer.stop)
+
+
+def write(item):
+    """ Persist a model instance (or run a callable) off the request path, or inline when AUDIT_ASYNC is off """
+    if settings.AUDIT_ASYNC:
+        writer.put(item)
+    else:
+        _write_now(item)
+
+
+async def awrite(item):
+    """ write() for async views, only the inline write (AUDIT_ASYNC off or a full queue) runs in a thread """
+    if settings.AUDIT_ASYNC and writer.offer(item):
+        return
+    await sync_to_async(_write_now)(item)
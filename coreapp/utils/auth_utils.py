@@ -1,12 +1,18 @@
 import random
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from rest_framework.authtoken.models import Token
 
-from coreapp.models import UserConfirmation, User
+from coreapp.authentication import invalidate_user_tokens
+from coreapp.models import AuthToken, UserConfirmation, User
+from coreapp.utils import identity_map_utils
+
+USER_IDENTITY_FIELDS = ('pk', 'email', 'mobile')
 
 
 def get_client_info(request):
@@ -20,18 +26,35 @@ def get_client_info(request):
 
 
 def get_user_by_email(email):
-    return User.objects.get(email=email)
+    return identity_map_utils.get_or_load(
+        User, 'email', email, lambda: User.objects.get(email=email), fields=USER_IDENTITY_FIELDS
+    )
 
 
 def get_user_by_mobile(mobile):
-    return User.objects.get(mobile=mobile)
+    return identity_map_utils.get_or_load(
+        User, 'mobile', mobile, lambda: User.objects.get(mobile=mobile), fields=USER_IDENTITY_FIELDS
+    )
+
+
+async def aget_user_by_mobile(mobile):
+    return await identity_map_utils.aget_or_load(
+        User, 'mobile', mobile, lambda: User.objects.aget(mobile=mobile), fields=USER_IDENTITY_FIELDS
+    )
 
 
 def regenerate_token(user):
-    token, created = Token.objects.get_or_create(user=user)
-    if not created:
-        token.delete()
-    return Token.objects.get_or_create(user=user)
+    """ Issue a fresh token for user, replacing the previous one in a single upsert """
+    token = AuthToken(user=user, key=AuthToken.generate_key(), expires_at=get_token_expiry())
+    AuthToken.objects.bulk_create(
+        [token], update_conflicts=True, unique_fields=['user'], update_fields=['key', 'expires_at', 'updated_at']
+    )
+    invalidate_user_tokens(user.pk)
+    return token
+
+
+def get_token_expiry():
+    return timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_TTL)
 
 
 def validate_user(user):
@@ -0,0 +1,115 @@
+import os
+import threading
+from asyncio import wrap_future
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HasherSaturated(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Server is busy, please try again shortly")
+    default_code = 'hasher_saturated'
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+class HasherPool:
+    """
+    Bounded process pool for PBKDF2 work. At most max_workers + max_pending jobs are accepted at a time,
+    anything beyond that is rejected immediately with HasherSaturated (503) instead of queueing.
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),),
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def _release(self, future):
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherSaturated()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ Return the process wide HasherPool, or None when PASSWORD_HASHER_POOL_SIZE disables it """
+    global _pool, _pool_pid
+    if settings.PASSWORD_HASHER_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = HasherPool(settings.PASSWORD_HASHER_POOL_SIZE, settings.PASSWORD_HASHER_MAX_PENDING)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def check_password(user, password):
+    pool = get_pool()
+    if pool is None:
+        return user.check_password(password)
+    is_correct, must_update = pool.submit(hashers.verify_password, password, user.password).result()
+    if is_correct and must_update:
+        set_password(user, password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def set_password(user, password):
+    pool = get_pool()
+    if pool is None:
+        user.set_password(password)
+        return
+    user.password = pool.submit(hashers.make_password, password).result()
+    user._password = password
+
+
+async def acheck_password(user, password):
+    pool = get_pool()
+    if pool is None:
+        is_correct, must_update = await sync_to_async(hashers.verify_password, thread_sensitive=False)(
+            password, user.password
+        )
+    else:
+        is_correct, must_update = await wrap_future(pool.submit(hashers.verify_password, password, user.password))
+    if is_correct and must_update:
+        await aset_password(user, password)
+        await user.asave(update_fields=['password'])
+    return is_correct
+
+
+async def aset_password(user, password):
+    pool = get_pool()
+    if pool is None:
+        user.password = await sync_to_async(hashers.make_password, thread_sensitive=False)(password)
+    else:
+        user.password = await wrap_future(pool.submit(hashers.make_password, password))
+    user._password = password
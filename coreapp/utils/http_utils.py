@@ -0,0 +1,137 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('django')
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+clients = {}
+
+
+def get_latency_key(name, bucket):
+    return f"http:latency:{name}:{bucket}"
+
+
+def get_error_key(name):
+    return f"http:errors:{name}"
+
+
+def incr(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_latency_histograms():
+    """ Calls per latency bucket and failed calls, per provider, shared by every worker through the cache """
+    histograms = {}
+    for name in clients:
+        keys = [get_latency_key(name, bucket) for bucket in LATENCY_BUCKETS] + [get_error_key(name)]
+        counts = cache.get_many(keys)
+        histograms[name] = {
+            'buckets': {bucket: counts.get(get_latency_key(name, bucket), 0) for bucket in LATENCY_BUCKETS},
+            'errors': counts.get(get_error_key(name), 0),
+        }
+    return histograms
+
+
+class ProviderClient:
+    """
+    HTTP client of one external provider. Calls go through a per process requests.Session whose pool keeps up
+    to pool_size connections alive, so they don't pay a TCP and TLS handshake each, and every call has connect
+    and read timeouts. Idempotent calls (GET, PUT, DELETE..., or idempotent=True for a POST the provider
+    deduplicates) are retried up to max_retries times on connection errors, timeouts and 429/5xx gateway
+    statuses, with full jitter exponential backoff. Other calls are only retried when the connection could not
+    be opened, as nothing was sent. Latencies are counted in a histogram per provider (get_latency_histograms).
+    base_url can be pointed at a local stub server in tests.
+    """
+
+    def __init__(self, name, base_url, connect_timeout, read_timeout, max_retries, retry_backoff, pool_size):
+        self.name = name
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.pool_size = pool_size
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        clients[name] = self
+
+    @property
+    def session(self):
+        # A forked worker must not share the parent's sockets
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+    def get_backoff(self, attempt):
+        return random.uniform(0, self.retry_backoff * 2 ** attempt)
+
+    def record(self, started, failed=False):
+        elapsed = (time.perf_counter() - started) * 1000
+        bucket = next(bucket for bucket in LATENCY_BUCKETS if elapsed <= bucket)
+        incr(get_latency_key(self.name, bucket))
+        if failed:
+            incr(get_error_key(self.name))
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """ requests.Session.request() on base_url + path, raises requests.RequestException once out of retries """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as exc:
+                self.record(started, failed=True)
+                if last_attempt or not (idempotent or isinstance(exc, requests.ConnectTimeout)):
+                    raise
+                logger.warning(f"{self.name} {method} {path} failed ({exc}), retrying")
+            else:
+                failed = response.status_code >= 500 or response.status_code in RETRY_STATUSES
+                self.record(started, failed=failed)
+                if last_attempt or not idempotent or response.status_code not in RETRY_STATUSES:
+                    return response
+                logger.warning(f"{self.name} {method} {path} returned {response.status_code}, retrying")
+            time.sleep(self.get_backoff(attempt))
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+
+def build_client(name, base_url):
+    return ProviderClient(
+        name, base_url,
+        connect_timeout=settings.PROVIDER_CONNECT_TIMEOUT,
+        read_timeout=settings.PROVIDER_READ_TIMEOUT,
+        max_retries=settings.PROVIDER_MAX_RETRIES,
+        retry_backoff=settings.PROVIDER_RETRY_BACKOFF,
+        pool_size=settings.PROVIDER_POOL_SIZE,
+    )
@@ -0,0 +1,67 @@
+import threading
+from contextvars import ContextVar
+
+_current = ContextVar('identity_map', default=None)
+_lock = threading.Lock()
+avoided_queries = 0
+
+
+class IdentityMap:
+    """ Objects loaded during one request, keyed by (model, field, value) so repeated lookups reuse one instance """
+
+    def __init__(self):
+        self.hits = 0
+        self._objects = {}
+
+    def get(self, model, field, value):
+        global avoided_queries
+        obj = self._objects.get((model, field, value))
+        if obj is not None:
+            self.hits += 1
+            with _lock:
+                avoided_queries += 1
+        return obj
+
+    def add(self, obj, fields):
+        for field in fields:
+            self._objects[(obj.__class__, field, getattr(obj, field))] = obj
+
+
+def begin():
+    """ Start a fresh identity map for the current thread / asyncio task, returns the token for end() """
+    return _current.set(IdentityMap())
+
+
+def end(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def get_or_load(model, field, value, load, fields=('pk',)):
+    """
+    Return the object of model whose field equals value from the current identity map, or call load() and
+    remember the result under field and every name in fields. Without an active map this is just load().
+    """
+    identity_map = current()
+    if identity_map is None:
+        return load()
+    obj = identity_map.get(model, field, value)
+    if obj is None:
+        obj = load()
+        identity_map.add(obj, {field, *fields})
+    return obj
+
+
+async def aget_or_load(model, field, value, aload, fields=('pk',)):
+    """ get_or_load() for async code, aload is a coroutine function """
+    identity_map = current()
+    if identity_map is None:
+        return await aload()
+    obj = identity_map.get(model, field, value)
+    if obj is None:
+        obj = await aload()
+        identity_map.add(obj, {field, *fields})
+    return obj
@@ -0,0 +1,23 @@
+from coreapp.models import LoginHistory
+from coreapp.utils import audit_utils
+
+
+def new_login_history(user, ip_address, user_agent, is_success):
+    return LoginHistory(
+        user=user,
+        ip_address=ip_address or '',
+        user_agent=(user_agent or '')[:500],
+        is_success=is_success,
+    )
+
+
+def record_login(user, ip_address, user_agent, is_success):
+    login_history = new_login_history(user, ip_address, user_agent, is_success)
+    audit_utils.write(login_history)
+    return login_history
+
+
+async def arecord_login(user, ip_address, user_agent, is_success):
+    login_history = new_login_history(user, ip_address, user_agent, is_success)
+    await audit_utils.awrite(login_history)
+    return login_history
@@ -1,38 +1,82 @@
-import random
+from functools import partial
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import get_random_string
 
 from coreapp.models import UserConfirmation
+from coreapp.utils import audit_utils
 
 
-def generate_code(user):
-    code = str(random.randint(100000, 999999))
-    while UserConfirmation.objects.filter(confirmation_code=code, user=user).exists():
-        code = str(random.randint(100000, 999999))
-    return code
+def get_code_key(user):
+    return f"otp:code:{user.pk}"
+
+
+def get_attempts_key(user):
+    return f"otp:attempts:{user.pk}"
+
+
+def generate_code():
+    return get_random_string(length=6, allowed_chars='0123456789')
+
+
+def new_user_confirmation(user, ip_address):
+    """ Return an unsaved UserConfirmation with a fresh code and the cache entries that make it the active one """
+    user_confirmation = UserConfirmation(user=user, ip_address=ip_address or '', confirmation_code=generate_code())
+    return user_confirmation, {
+        get_code_key(user): user_confirmation.confirmation_code,
+        get_attempts_key(user): 0,
+    }
 
 
 def create_user_confirmation(user, ip_address):
-    confirmation_code = UserConfirmation.objects.create(
-        user=user,
-        ip_address=ip_address,
-        confirmation_code=generate_code(user))
-    confirmation_code.save()
-    return confirmation_code
+    """ Issue a new code for user, replacing any active one, and audit it in UserConfirmation """
+    user_confirmation, entries = new_user_confirmation(user, ip_address)
+    cache.set_many(entries, settings.OTP_TTL)
+    audit_utils.write(user_confirmation)
+    return user_confirmation
 
 
-def is_code_valid(user, code):
-    try:
-        otp_code = get_code(user, code)
-        return True
-    except ObjectDoesNotExist:
-        return False
+async def acreate_user_confirmation(user, ip_address):
+    user_confirmation, entries = new_user_confirmation(user, ip_address)
+    await cache.aset_many(entries, settings.OTP_TTL)
+    await audit_utils.awrite(user_confirmation)
+    return user_confirmation
 
 
-def get_code(user, code):
-    return UserConfirmation.objects.get(user=user, is_used=False, confirmation_code=code)
+def mark_code_used(user_id, code):
+    UserConfirmation.objects.filter(user_id=user_id, confirmation_code=code, is_used=False).update(is_used=True)
+
+
+def verify_code(user, code, consume=True):
+    """
+    Check code against the active code of user, counting the attempt. With consume the code is also removed,
+    deleting the key is what makes verification single use when two requests race with the same code.
+    """
+    code_key, attempts_key = get_code_key(user), get_attempts_key(user)
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:
+        # No active code, it expired or was already consumed
+        return False
+    if attempts > settings.OTP_MAX_ATTEMPTS:
+        cache.delete_many([code_key, attempts_key])
+        return False
+    if cache.get(code_key) != code:
+        return False
+    if consume:
+        if not cache.delete(code_key):
+            return False
+        cache.delete(attempts_key)
+        audit_utils.write(partial(mark_code_used, user.pk, code))
+    return True
 
 
 def send_otp(user_confirmation):
     pass
     # send_otp_via_sms(user_confirmation.user.mobile, user_confirmation.confirmation_code)
+
+
+async def asend_otp(user_confirmation):
+    pass
+    # await sync_to_async(send_otp_via_sms)(user_confirmation.user.mobile, user_confirmation.confirmation_code)
@@ -0,0 +1,33 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountError(AssertionError):
+    pass
+
+
+def count_queries(func, using=DEFAULT_DB_ALIAS):
+    """ Call func() and return (number of queries it ran, the captured queries) """
+    with CaptureQueriesContext(connections[using]) as context:
+        func()
+    return len(context), context.captured_queries
+
+
+def assert_constant_queries(func, grow, steps=3, using=DEFAULT_DB_ALIAS):
+    """
+    Assert func() runs the same number of queries however many rows there are: func() is called once to
+    warm process caches (token cache, identity map...), then again after each of `steps` calls to grow(),
+    which should add rows func() reads. Returns the query count, raises QueryCountError when it changes.
+    """
+    func()
+    counts, queries = [], []
+    for _ in range(steps):
+        grow()
+        count, queries = count_queries(func, using)
+        counts.append(count)
+    if len(set(counts)) != 1:
+        raise QueryCountError(
+            f"Query count changes with the number of rows: {counts}, last run:\n"
+            + "\n".join(query['sql'] for query in queries)
+        )
+    return counts[0]
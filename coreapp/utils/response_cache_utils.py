@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+
+class ResponseCache:
+    """
+    Rendered response bodies in the shared cache, for endpoints whose content rarely changes (see
+    coreapp.mixins.CachedResponseMixin). All entries of one cache are invalidated together by replacing its
+    version token, which save signals do through invalidate(). After an invalidation only the worker that wins
+    an add() lock rebuilds an entry, the others keep serving the previous body meanwhile, or wait up to
+    wait_timeout seconds for the new one when there is none.
+    """
+
+    def __init__(self, name, timeout=None, lock_timeout=10, wait_timeout=2, poll_interval=0.05):
+        self.name = name
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.version_key = f"response:{name}:version"
+
+    def get_entry_key(self, variant):
+        return f"response:{self.name}:{hashlib.md5(variant.encode()).hexdigest()}"
+
+    def get_lock_key(self, variant):
+        return f"{self.get_entry_key(variant)}:lock"
+
+    def get_version(self, version):
+        if version is None:
+            # First use or evicted, a new token drops every entry
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def lookup(self, variant):
+        """
+        Return (entry, version, must_build). entry is the current one, or the previous one while another worker
+        rebuilds. must_build is True when the caller holds the rebuild lock and should set() the new body.
+        """
+        entry_key = self.get_entry_key(variant)
+        values = cache.get_many([self.version_key, entry_key])
+        version = self.get_version(values.get(self.version_key))
+        entry = values.get(entry_key)
+        if entry is not None and entry['version'] == version:
+            return entry, version, False
+        if cache.add(self.get_lock_key(variant), 1, self.lock_timeout):
+            return None, version, True
+        if entry is not None:
+            return entry, version, False
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = cache.get(entry_key)
+            if entry is not None and entry['version'] == version:
+                return entry, version, False
+        # The rebuilding worker is slow or gone, build without storing
+        return None, version, False
+
+    async def alookup(self, variant):
+        """ lookup() for async views """
+        entry_key = self.get_entry_key(variant)
+        values = await cache.aget_many([self.version_key, entry_key])
+        version = values.get(self.version_key)
+        if version is None:
+            await cache.aadd(self.version_key, uuid.uuid4().hex, None)
+            version = await cache.aget(self.version_key)
+        entry = values.get(entry_key)
+        if entry is not None and entry['version'] == version:
+            return entry, version, False
+        if await cache.aadd(self.get_lock_key(variant), 1, self.lock_timeout):
+            return None, version, True
+        if entry is not None:
+            return entry, version, False
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            entry = await cache.aget(entry_key)
+            if entry is not None and entry['version'] == version:
+                return entry, version, False
+        return None, version, False
+
+    def set(self, variant, version, content, content_type):
+        """ Store a body built under version (read before building, so a racing invalidation wins) """
+        entry = {
+            'version': version,
+            'content': content,
+            'content_type': content_type,
+            'etag': quote_etag(hashlib.md5(content).hexdigest()),
+        }
+        cache.set(self.get_entry_key(variant), entry, self.timeout)
+        self.release(variant)
+        return entry
+
+    def release(self, variant):
+        cache.delete(self.get_lock_key(variant))
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, None)
@@ -1,11 +1,10 @@
 from twilio.rest import Client
 
-from utility.models import GlobalSettings
+from utility.utils.settings_utils import get_global_settings
 
 
 def get_system_settings():
-    global_settings = GlobalSettings.objects.first()
-    return global_settings
+    return get_global_settings()
 
 
 def get_twilio_client(account_id, token):
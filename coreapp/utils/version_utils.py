@@ -0,0 +1,72 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """ The version token stored at key in the shared cache, created on first use """
+    version = cache.get(key)
+    if version is None:
+        # First use or evicted, a new token makes every worker reload
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+class VersionedCache:
+    """
+    Process local copy of a value loaded from the database, checked against a version token in the shared
+    cache: a hit costs one cache.get instead of the queries of load(). invalidate() replaces the token, so every
+    worker reloads on its next call. Subclasses set version_key and implement load() and aload().
+    The returned value is shared, treat it as read only.
+    """
+    version_key = None
+
+    def __init__(self):
+        self._entry = (None, None)
+        self._lock = threading.Lock()
+
+    def load(self):
+        raise NotImplementedError('.load() must be overridden')
+
+    async def aload(self):
+        raise NotImplementedError('.aload() must be overridden')
+
+    def get(self):
+        version = get_version(self.version_key)
+        cached_version, value = self._entry
+        if cached_version == version:
+            return value
+        with self._lock:
+            cached_version, value = self._entry
+            if cached_version != version:
+                # Stored with the version read before loading, a save racing with the load causes another reload
+                value = self.load()
+                self._entry = (version, value)
+            return value
+
+    async def aget(self):
+        version = await aget_version(self.version_key)
+        cached_version, value = self._entry
+        if cached_version == version:
+            return value
+        value = await self.aload()
+        self._entry = (version, value)
+        return value
+
+    def invalidate(self):
+        bump_version(self.version_key)
+        self._entry = (None, None)
@@ -1,3 +1,57 @@
-from django.shortcuts import render
+from inspect import isawaitable
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with coroutine handlers, served on the event loop under ASGI (under WSGI Django runs them with
+    async_to_sync). Handlers should use the async ORM: ATOMIC_REQUESTS does not apply, so multi-statement
+    writes need their own transaction. Authentication uses the sync ORM, so it runs in a thread when the view
+    has authentication classes; public views should set authentication_classes = [] to stay on the loop.
+    Views with database work in initial() (like ConditionalGetMixin) provide it in ainitial().
+    Async variants subclass the sync view first, class AsyncFooAPI(FooAPI, AsyncAPIView), so its mixins come
+    before AsyncAPIView in the MRO.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Django refuses ATOMIC_REQUESTS on async views
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    async def ainitial(self, request, *args, **kwargs):
+        """ initial() for async handlers """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+        if self.authentication_classes:
+            await sync_to_async(self.perform_authentication)(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            # options() and http_method_not_allowed() are sync
+            if isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
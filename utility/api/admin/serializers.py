@@ -1,9 +1,13 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from ...models import GlobalSettings, Page, Payment
+from ...utils import page_utils
+from coreapp.base import SparseFieldsMixin
+from coreapp.models import Document
 
 
-class GlobalSettingsSerializer(serializers.ModelSerializer):
+class GlobalSettingsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     logo_url = serializers.CharField(source='get_logo_url', read_only=True)
 
     class Meta:
@@ -11,12 +15,35 @@ class GlobalSettingsSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class PageSerializer(serializers.ModelSerializer):
+class PageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     thumbnail_url = serializers.CharField(source='get_thumbnail_url', read_only=True)
 
     class Meta:
         model = Page
-        fields = "__all__"
+        exclude = ("search_vector",)
+
+
+class PageImportListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # One query for every referenced Document instead of one per row and field
+        document_ids = {row[key] for row in attrs for key in ('thumbnail_id', 'attachment_id') if row.get(key)}
+        missing = document_ids - set(Document.objects.filter(id__in=document_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(_("Invalid documents: %s") % ", ".join(map(str, sorted(missing))))
+        return attrs
+
+    def create(self, validated_data):
+        return page_utils.bulk_create_pages(validated_data)
+
+
+class PageImportSerializer(serializers.ModelSerializer):
+    thumbnail = serializers.IntegerField(source='thumbnail_id')
+    attachment = serializers.IntegerField(source='attachment_id', required=False, allow_null=True)
+
+    class Meta:
+        model = Page
+        fields = ('title', 'desc', 'thumbnail', 'attachment', 'video_url', 'page_type', 'is_active')
+        list_serializer_class = PageImportListSerializer
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -1,11 +1,14 @@
 from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, mixins, views, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from django_filters import rest_framework as dj_filters
 from . import serializers
 from .. import filters
 from ...models import GlobalSettings, Page
+from ...utils import settings_utils
+from coreapp.mixins import ConditionalGetMixin, RelatedLoadingMixin
 
 
 class GlobalSettingsAPI(views.APIView):
@@ -15,8 +18,8 @@ class GlobalSettingsAPI(views.APIView):
         responses={200: serializers.GlobalSettingsSerializer}
     )
     def get(self, request):
-        global_settings = GlobalSettings.objects.first()
-        serializer = serializers.GlobalSettingsSerializer(global_settings)
+        global_settings = settings_utils.get_global_settings()
+        serializer = serializers.GlobalSettingsSerializer(global_settings, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -30,7 +33,18 @@ class GlobalSettingsAPI(views.APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class PageAdminAPI(viewsets.ModelViewSet):
+class PageAdminAPI(ConditionalGetMixin, RelatedLoadingMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminUser, ]
     queryset = Page.objects.all()
     serializer_class = serializers.PageSerializer
+
+    @extend_schema(
+        request=serializers.PageImportSerializer(many=True),
+        responses={201: None}
+    )
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        serializer = serializers.PageImportSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        pages = serializer.save()
+        return Response({"count": len(pages)}, status=status.HTTP_201_CREATED)
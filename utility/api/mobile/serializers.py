@@ -1,9 +1,14 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from ... import constants
 from ...models import GlobalSettings, Page, Payment
+from ...utils import payment_utils
+from coreapp.base import SparseFieldsMixin
+from coreapp.models import Document
 
 
-class InfoSerializer(serializers.ModelSerializer):
+class InfoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     logo_url = serializers.CharField(read_only=True, source='get_logo_url')
 
     class Meta:
@@ -11,19 +16,63 @@ class InfoSerializer(serializers.ModelSerializer):
         fields = ('site_name', 'website_url', 'email', 'phone', 'address', 'logo_url')
 
 
-class PageListSerializer(serializers.ModelSerializer):
+class PageListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     thumbnail_url = serializers.CharField(read_only=True, source='get_thumbnail_url')
     attachment_url = serializers.CharField(read_only=True, source='get_attachment_url')
 
     class Meta:
         model = Page
         fields = ('id', 'title', 'video_url', 'thumbnail_url', 'attachment_url', 'created_at')
+        values_sources = {
+            'thumbnail_url': ('thumbnail__document', Document.build_url),
+            'attachment_url': ('attachment__document', Document.build_url),
+        }
 
 
-class PageDetailsSerializer(serializers.ModelSerializer):
+class PageDetailsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     thumbnail_url = serializers.CharField(read_only=True, source='get_thumbnail_url')
     attachment_url = serializers.CharField(read_only=True, source='get_attachment_url')
 
     class Meta:
         model = Page
-        fields = '__all__'
+        exclude = ('search_vector',)
+
+
+class PageSearchSerializer(PageListSerializer):
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+
+    class Meta(PageListSerializer.Meta):
+        fields = PageListSerializer.Meta.fields + ('rank', 'headline')
+
+
+class PaymentCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Payment
+        fields = ('amount', 'payment_method')
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError(_("Amount must be greater than zero"))
+        return value
+
+    def validate_payment_method(self, value):
+        if value not in (constants.PaymentMethod.PAYPAL, constants.PaymentMethod.BILLPLZ):
+            raise serializers.ValidationError(_("Unsupported payment method"))
+        return value
+
+
+class PaymentStatusSerializer(serializers.ModelSerializer):
+    bill_url = serializers.SerializerMethodField()
+    bill_status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Payment
+        fields = ('uid', 'amount', 'payment_method', 'status', 'bill_url', 'bill_status')
+
+    def get_bill_url(self, obj):
+        # Empty until the outbox worker created the bill
+        return obj.bill_url or None
+
+    def get_bill_status(self, obj):
+        return payment_utils.get_bill_status(obj)
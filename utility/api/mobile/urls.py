@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework import routers
 
@@ -7,6 +8,8 @@ router = routers.DefaultRouter()
 router.register(r"page", views.PageReadOnlyAPI)
 
 urlpatterns = [
-    path("info/", views.InfoAPI.as_view()),
+    path("info/", (views.AsyncInfoAPI if settings.ASYNC_VIEWS else views.InfoAPI).as_view()),
+    path("payment/", views.PaymentAPI.as_view()),
+    path("payment/<uuid:uid>/", views.PaymentStatusAPI.as_view()),
 ]
 urlpatterns += router.urls
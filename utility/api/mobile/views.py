@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django_filters import rest_framework as dj_filters
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import viewsets, status, views
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
@@ -10,33 +11,69 @@ from rest_framework.views import APIView
 from . import serializers
 from .. import filters
 from ... import constants
-from ...models import GlobalSettings, Page
-from ...utils import payment_utils
+from ...models import Page
+from ...utils import page_utils, payment_utils, search_utils, settings_utils
+from ...utils.response_cache_utils import fixed_page_response_cache, info_response_cache
+from coreapp.mixins import CachedResponseMixin, ConditionalGetMixin, RelatedLoadingMixin, ValuesListMixin
+from coreapp.views import AsyncAPIView
 from coreapp.utils.auth_utils import get_client_info
 
 
-class InfoAPI(views.APIView):
+class InfoAPI(CachedResponseMixin, ConditionalGetMixin, views.APIView):
     permission_classes = [AllowAny, ]
+    response_cache = info_response_cache
+
+    def build_settings_validators(self, request, global_settings):
+        return self.build_validators(request, {
+            'last_modified': global_settings.updated_at if global_settings else None,
+            'count': 1 if global_settings else 0,
+        })
+
+    def get_validators(self, request):
+        # From the cached row, no aggregate query
+        return self.build_settings_validators(request, settings_utils.get_global_settings())
+
+    async def aget_validators(self, request):
+        return self.build_settings_validators(request, await settings_utils.aget_global_settings())
 
     @extend_schema(
         responses={200: serializers.InfoSerializer}
     )
     def get(self, request):
-        global_settings = GlobalSettings.objects.first()
-        serializer = serializers.InfoSerializer(global_settings)
+        global_settings = settings_utils.get_global_settings()
+        serializer = serializers.InfoSerializer(global_settings, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class PageReadOnlyAPI(viewsets.ReadOnlyModelViewSet):
+class AsyncInfoAPI(InfoAPI, AsyncAPIView):
+    authentication_classes = []
+
+    @extend_schema(
+        responses={200: serializers.InfoSerializer}
+    )
+    async def get(self, request):
+        global_settings = await settings_utils.aget_global_settings()
+        serializer = serializers.InfoSerializer(global_settings, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class PageReadOnlyAPI(CachedResponseMixin, ConditionalGetMixin, RelatedLoadingMixin, ValuesListMixin,
+                      viewsets.ReadOnlyModelViewSet):
     permission_classes = [AllowAny, ]
+    response_cache = fixed_page_response_cache
+    cached_actions = ('fixed_page',)
     queryset = Page.objects.filter(is_active=True)
     serializer_class = serializers.PageListSerializer
     filter_backends = (dj_filters.DjangoFilterBackend,)
     filterset_fields = ('page_type',)
+    # fixed_page is validated against its cached ETag (CachedResponseMixin)
+    conditional_actions = ('list', 'retrieve')
 
     def get_serializer_class(self):
         if self.action == "retrieve":
             return serializers.PageDetailsSerializer
+        if self.action == "search":
+            return serializers.PageSearchSerializer
         return self.serializer_class
 
     @extend_schema(
@@ -44,8 +81,63 @@ class PageReadOnlyAPI(viewsets.ReadOnlyModelViewSet):
     )
     @action(detail=True, methods=['get'], url_path='fixed-page')
     def fixed_page(self, request, pk=None):
-        page = Page.objects.filter(page_type=pk, is_active=True).first()
+        page = page_utils.get_fixed_page(pk)
         if page:
-            serializer = serializers.PageDetailsSerializer(page)
+            serializer = serializers.PageDetailsSerializer(page, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({"detail": _("Page not found")}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return Response({"detail": _("Page not found")}, status=status.HTTP_404_NOT_FOUND)
+
+    @extend_schema(
+        parameters=[OpenApiParameter('q', str, required=True)],
+        responses={200: serializers.PageSearchSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"detail": _("Search text is required")}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = search_utils.search_pages(self.filter_queryset(self.get_queryset()), text)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class PaymentAPI(APIView):
+    permission_classes = [AllowAny, ]
+    throttle_scope = 'payment'
+
+    @extend_schema(
+        request=serializers.PaymentCreateSerializer,
+        responses={202: serializers.PaymentStatusSerializer}
+    )
+    def post(self, request):
+        serializer = serializers.PaymentCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ip, user_agent = get_client_info(request)
+        # The bill is created by the process_payment_outbox worker, poll PaymentStatusAPI for its url
+        payment = payment_utils.create_payment(ip_address=ip, **serializer.validated_data)
+        return Response(serializers.PaymentStatusSerializer(payment).data, status=status.HTTP_202_ACCEPTED)
+
+
+class PaymentStatusAPI(AsyncAPIView):
+    permission_classes = [AllowAny, ]
+    # Long polling waits on the event loop, not in a worker thread
+    authentication_classes = []
+    throttle_scope = 'payment_status'
+
+    @extend_schema(
+        parameters=[OpenApiParameter('wait', int, description="Seconds to wait for the bill url")],
+        responses={200: serializers.PaymentStatusSerializer}
+    )
+    async def get(self, request, uid):
+        try:
+            wait = min(max(int(request.query_params.get('wait', 0)), 0), settings.PAYMENT_POLL_TIMEOUT)
+        except ValueError:
+            wait = 0
+        payment = await payment_utils.await_bill(uid, wait)
+        if payment is None:
+            return Response({"detail": _("Payment not found")}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serializers.PaymentStatusSerializer(payment).data, status=status.HTTP_200_OK)
@@ -23,3 +23,11 @@ class PaymentMethod(models.IntegerChoices):
     PAYPAL = 0, _("Paypal")
     BILLPLZ = 1, _("BillPlz")
     CASH = 2, _("Cash")
+
+
+# Payment bill outbox
+class OutboxStatus(models.IntegerChoices):
+    PENDING = 0, _("Pending")
+    PROCESSING = 1, _("Processing")
+    DONE = 2, _("Done")
+    FAILED = 3, _("Failed")
@@ -0,0 +1,93 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from coreapp import constants
+from coreapp.models import Document, User
+from utility.constants import PageType
+from utility.models import Page
+from utility.utils import search_utils
+
+WORDS = (
+    'account', 'address', 'billing', 'cancel', 'card', 'contact', 'cookie', 'data', 'delivery', 'device',
+    'email', 'fee', 'guide', 'help', 'invoice', 'language', 'login', 'mobile', 'order', 'password', 'payment',
+    'policy', 'privacy', 'profile', 'refund', 'return', 'security', 'service', 'shipping', 'support', 'terms',
+    'update', 'verification', 'wallet', 'warranty',
+)
+FILLER_WORDS = 5000
+
+
+class Command(BaseCommand):
+    help = 'Compare Page search (search_utils.search_pages) with a plain icontains scan over synthetic pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--queries', nargs='+', default=['privacy policy', 'refund', 'shipping fee invoice'])
+        parser.add_argument('--page-size', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def timed(self, run, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def synthetic_text(self, vocabulary, words):
+        return ' '.join(random.choice(vocabulary) for _ in range(words))
+
+    def handle(self, *args, **options):
+        user = User.objects.first()
+        if user is None:
+            self.stderr.write("At least one user is needed to own the synthetic thumbnail")
+            return
+        page_size, repeat = options['page_size'], options['repeat']
+        random.seed(0)
+        # Topic words are rare among random filler, like in real pages
+        filler = [
+            ''.join(random.choices('abcdefghijklmnopqrstuvwxyz', k=random.randint(3, 9))) for _ in range(FILLER_WORDS)
+        ]
+        vocabulary = list(WORDS) + filler
+        # Synthetic rows are rolled back at the end
+        with transaction.atomic():
+            document = Document.objects.create(
+                owner=user, document='documents/benchmark.png', doc_type=constants.DocumentChoices.IMAGE
+            )
+            pages = Page.objects.bulk_create(
+                (
+                    Page(
+                        title=self.synthetic_text(vocabulary, 4), desc=self.synthetic_text(vocabulary, 60),
+                        slug=uuid.uuid4().hex, thumbnail=document, page_type=PageType.GENERAL, is_active=True,
+                    )
+                    for _ in range(options['rows'])
+                ),
+                batch_size=5000,
+            )
+            search_utils.update_search_vectors(Page.objects.filter(pk__gte=pages[0].pk))
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE utility_page')
+
+            queryset = Page.objects.filter(is_active=True)
+            self.stdout.write(f"{connection.vendor}, {options['rows']} pages")
+            self.stdout.write(f"{'query':<24} {'matches':>8} {'search ms':>10} {'icontains ms':>13}")
+            for text in options['queries']:
+                def search():
+                    results = search_utils.search_pages(queryset, text)
+                    return results.count(), list(results[:page_size])
+
+                def scan():
+                    condition = Q()
+                    for term in text.split():
+                        condition &= Q(title__icontains=term) | Q(desc__icontains=term)
+                    results = queryset.filter(condition).order_by('pk')
+                    return results.count(), list(results[:page_size])
+
+                matches = search()[0]
+                self.stdout.write(
+                    f"{text:<24} {matches:>8} {self.timed(search, repeat):>10.1f} {self.timed(scan, repeat):>13.1f}"
+                )
+            transaction.set_rollback(True)
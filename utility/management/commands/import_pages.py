@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utility.api.admin.serializers import PageImportSerializer
+from utility.utils import page_utils
+
+
+class Command(BaseCommand):
+    help = 'Create pages from a JSON list of {title, desc, thumbnail, attachment, video_url, page_type, is_active}'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=page_utils.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        with open(options['path']) as file:
+            rows = json.load(file)
+        serializer = PageImportSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors, default=str))
+        pages = page_utils.bulk_create_pages(serializer.validated_data, batch_size=options['batch_size'])
+        self.stdout.write(f"Imported {len(pages)} pages")
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from utility.utils import payment_utils
+
+
+class Command(BaseCommand):
+    help = 'Create provider bills for the payments in the outbox, at most --concurrency provider calls at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Stop when no row is due instead of polling')
+
+    def process(self, outbox):
+        # Worker threads keep their own connection, drop it when it is stale
+        close_old_connections()
+        try:
+            return payment_utils.process_outbox_entry(outbox)
+        finally:
+            close_old_connections()
+
+    def handle(self, *args, **options):
+        concurrency, poll_interval = options['concurrency'], options['poll_interval']
+        processed = failed = 0
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                if len(in_flight) < concurrency:
+                    claimed = payment_utils.claim_outbox(concurrency - len(in_flight))
+                    in_flight.update(executor.submit(self.process, outbox) for outbox in claimed)
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                done, in_flight = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    processed += 1
+                    if not future.result():
+                        failed += 1
+        self.stdout.write(f"Processed {processed} outbox rows, {failed} not created yet or given up")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from coreapp.utils.http_utils import get_latency_histograms
+from utility.utils import billplz_utils, paypal_utils  # noqa: F401, registers the provider clients
+
+
+class Command(BaseCommand):
+    help = 'Show the latency histogram and failed calls of each payment provider client'
+
+    def handle(self, *args, **kwargs):
+        for name, histogram in get_latency_histograms().items():
+            total = sum(histogram['buckets'].values())
+            self.stdout.write(f"{name}: {total} calls, {histogram['errors']} failed")
+            for bucket, count in histogram['buckets'].items():
+                label = f"<= {bucket:g} ms" if bucket != float('inf') else "slower"
+                self.stdout.write(f"  {label:>12}: {count}")
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utility', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['page_type', 'is_active'], name='utility_page_type_active_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # GIN is PostgreSQL only, SQLite searches with LIKE (utility.utils.search_utils)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "UPDATE utility_page SET search_vector = "
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(\"desc\", '')), 'B')"
+    )
+    schema_editor.execute("CREATE INDEX utility_page_search_vector_idx ON utility_page USING gin (search_vector)")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS utility_page_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utility', '0002_page_utility_page_type_active_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
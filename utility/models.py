@@ -1,11 +1,13 @@
 import uuid
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.utils.functional import cached_property
 
-from coreapp.base import BaseModel
+from coreapp.base import BaseModel, depends_on
 from utility import constants
-from .utils import slug_utils
+from .utils import search_utils, slug_utils
 
 
 class GlobalSettings(BaseModel):
@@ -33,6 +35,7 @@ class GlobalSettings(BaseModel):
     paypal_client_secret = models.CharField(max_length=100)
 
     @cached_property
+    @depends_on('logo')
     def get_logo_url(self):
         return self.logo.get_url
 
@@ -52,22 +55,35 @@ class Page(BaseModel):
     video_url = models.CharField(max_length=100, null=True, blank=True)
     page_type = models.IntegerField(choices=constants.PageType.choices)
     is_active = models.BooleanField(default=0)
+    # Filled by save() on PostgreSQL, GIN indexed by migration 0003 (search_utils.search_pages)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['page_type', 'is_active'], name='utility_page_type_active_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
     @cached_property
+    @depends_on('thumbnail')
     def get_thumbnail_url(self):
         return self.thumbnail.get_url
 
     @cached_property
+    @depends_on('attachment')
     def get_attachment_url(self):
-        return self.attachment.get_url
+        return self.attachment.get_url if self.attachment_id else None
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slug_utils.generate_unique_slug(self.title, self)
-        super(Page, self).save(**kwargs)
+        if self.slug:
+            super(Page, self).save(*args, **kwargs)
+        else:
+            slug_utils.save_with_unique_slug(self, self.title, super(Page, self).save, *args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'title', 'desc'} & set(update_fields):
+            search_utils.update_search_vectors(Page.objects.db_manager(self._state.db).filter(pk=self.pk))
 
 
 class Payment(BaseModel):
@@ -84,3 +100,24 @@ class Payment(BaseModel):
 
     def __str__(self):
         return self.bill_uid
+
+
+class PaymentOutbox(BaseModel):
+    """
+    Bill creation pending for a payment, written in the same transaction as the Payment and drained by the
+    process_payment_outbox command (utility.utils.payment_utils). available_at is the next attempt for pending
+    rows and the claim expiry for processing ones, after which another worker takes the row over.
+    """
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='outbox')
+    status = models.SmallIntegerField(choices=constants.OutboxStatus.choices, default=constants.OutboxStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='utility_outbox_status_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.payment.uid)
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from coreapp.models import Document
+from .models import GlobalSettings, Page
+from .utils.page_utils import invalidate_pages
+from .utils.response_cache_utils import info_response_cache
+from .utils.settings_utils import global_settings_cache
+
+
+def invalidate_global_settings_caches():
+    global_settings_cache.invalidate()
+    info_response_cache.invalidate()
+
+
+@receiver(post_save, sender=GlobalSettings)
+@receiver(post_delete, sender=GlobalSettings)
+def invalidate_global_settings(sender, instance, **kwargs):
+    """ Reload GlobalSettings in every worker once the change is committed (GlobalSettingsAPI, admin, shell) """
+    transaction.on_commit(invalidate_global_settings_caches)
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def invalidate_page(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_pages)
+
+
+@receiver(post_save, sender=Document)
+def invalidate_documents(sender, instance, created, **kwargs):
+    # A new Document is not referenced yet
+    if created:
+        return
+    if GlobalSettings.objects.filter(logo=instance).exists():
+        transaction.on_commit(invalidate_global_settings_caches)
+    if Page.objects.filter(Q(thumbnail=instance) | Q(attachment=instance)).exists():
+        transaction.on_commit(invalidate_pages)
@@ -1,3 +1,366 @@
-from django.test import TestCase
+import datetime
+import threading
+import time
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import constants
+from .api.mobile.serializers import PageListSerializer
+from .models import Page, Payment, PaymentOutbox
+from .utils import page_utils, payment_utils, search_utils, slug_utils
+from .utils.paypal_utils import AccessTokenCache
+from coreapp.base import get_values_plan
+from coreapp.constants import DocumentChoices
+from coreapp.models import Country, Document, User
+from coreapp.throttling import SlidingWindowThrottle
+from coreapp.utils.query_utils import assert_constant_queries
+from coreapp.utils.version_utils import bump_version
+
+
+class AccessTokenCacheTests(SimpleTestCase):
+    global_settings = SimpleNamespace(paypal_client_id='client', paypal_client_secret='secret')
+
+    def setUp(self):
+        cache.clear()
+        self.fetches = 0
+        self.release = threading.Event()
+
+    def slow_fetch(self, global_settings):
+        self.fetches += 1
+        self.release.wait(5)
+        return f'token-{self.fetches}', 3600
+
+    def test_get_does_not_block_during_refresh(self):
+        token_cache = AccessTokenCache(self.slow_fetch, expiry_margin=0, refresh_ahead=60)
+        # Usable for 30 more seconds, within refresh_ahead
+        cache.set(token_cache.get_key(self.global_settings), {
+            'token': 'old',
+            'fingerprint': token_cache.get_fingerprint(self.global_settings),
+            'expires_at': time.time() + 30,
+        }, 30)
+
+        started = time.monotonic()
+        self.assertEqual(token_cache.get(self.global_settings), 'old')
+        self.assertEqual(token_cache.get(self.global_settings), 'old')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        self.release.set()
+        deadline = time.monotonic() + 5
+        while token_cache.get_entry(self.global_settings, token_cache.refresh_ahead) is None:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(token_cache.get(self.global_settings), 'token-1')
+        self.assertEqual(self.fetches, 1)
+
+    def test_concurrent_misses_fetch_once(self):
+        token_cache = AccessTokenCache(self.slow_fetch, expiry_margin=0, refresh_ahead=60)
+        tokens = []
+        threads = [
+            threading.Thread(target=lambda: tokens.append(token_cache.get(self.global_settings))) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(tokens, ['token-1'] * 4)
+        self.assertEqual(self.fetches, 1)
+
+
+@override_settings(PAYMENT_FAKE_PROVIDER=True)
+class PaymentAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_payment(self):
+        return self.client.post(
+            '/api/v1/utility/mobile/payment/', {'amount': '10.00', 'payment_method': constants.PaymentMethod.BILLPLZ}
+        )
+
+    @mock.patch.dict(SlidingWindowThrottle.THROTTLE_RATES, {'payment_ip': '2/min'})
+    def test_create_is_throttled(self):
+        self.assertEqual(self.create_payment().status_code, 202)
+        self.assertEqual(self.create_payment().status_code, 202)
+        self.assertEqual(self.create_payment().status_code, 429)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_status_waits_for_bill(self):
+        uid = self.create_payment().data['uid']
+        payment_utils.process_outbox_entry(payment_utils.claim_outbox(1)[0])
+        response = self.client.get(f'/api/v1/utility/mobile/payment/{uid}/?wait=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bill_status'], constants.OutboxStatus.DONE)
+        self.assertEqual(response.data['bill_url'], Payment.objects.get(uid=uid).bill_url)
+
+    @override_settings(PAYMENT_POLL_TIMEOUT=1)
+    def test_status_wait_is_capped(self):
+        uid = self.create_payment().data['uid']
+        started = time.monotonic()
+        response = self.client.get(f'/api/v1/utility/mobile/payment/{uid}/?wait=60')
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertEqual(response.data['bill_status'], constants.OutboxStatus.PENDING)
+
+
+@override_settings(PAYMENT_FAKE_PROVIDER=True)
+class PaymentOutboxTests(TransactionTestCase):
+    # The command's worker threads use their own connections, so rows must be committed
+
+    def test_bill_created_once(self):
+        payments = [payment_utils.create_payment(10, constants.PaymentMethod.BILLPLZ, '127.0.0.1') for _ in range(6)]
+        # SQLite's in-memory test database locks tables on concurrent writes
+        concurrency = 4 if connection.vendor == 'postgresql' else 1
+        with mock.patch.object(payment_utils, 'fake_create_bill', wraps=payment_utils.fake_create_bill) as create:
+            call_command('process_payment_outbox', once=True, concurrency=concurrency, stdout=StringIO())
+            call_command('process_payment_outbox', once=True, concurrency=concurrency, stdout=StringIO())
+        self.assertEqual(sorted(call.args[0].pk for call in create.call_args_list), [p.pk for p in payments])
+        for outbox in PaymentOutbox.objects.select_related('payment'):
+            self.assertEqual(outbox.status, constants.OutboxStatus.DONE)
+            self.assertEqual(outbox.attempts, 1)
+            self.assertEqual(outbox.payment.bill_uid, f'fake-{outbox.payment.uid}')
+
+
+class PageTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Malaysia', code='MY', phone_code='60', flag='')
+        cls.admin = User.objects.create(
+            first_name='Ali', last_name='Abu', email='ali@example.com', mobile='60123456789',
+            dob=datetime.date(1990, 1, 1), country=country, is_staff=True,
+        )
+        cls.thumbnail = Document.objects.create(
+            owner=cls.admin, document='documents/thumbnail.png', doc_type=DocumentChoices.IMAGE
+        )
+        cls.refund = cls.create_page('Refund policy', 'How to ask for a refund of your order')
+        cls.shipping = cls.create_page('Shipping', 'Delivery fees, and the refund of shipping fees')
+        cls.inactive = cls.create_page('Old refund policy', 'Replaced', is_active=False)
+
+    @classmethod
+    def create_page(cls, title, desc, is_active=True):
+        return Page.objects.create(
+            title=title, desc=desc, thumbnail=cls.thumbnail, page_type=constants.PageType.GENERAL,
+            is_active=is_active,
+        )
+
+
+class PageListQueryTests(PageTestCase):
+    def add_pages(self):
+        documents = Document.objects.bulk_create(
+            Document(owner=self.admin, document='documents/page.png', doc_type=DocumentChoices.IMAGE)
+            for _ in range(10)
+        )
+        Page.objects.bulk_create(
+            Page(
+                title='Page', desc='', slug=f'page-{documents[i].pk}', thumbnail=documents[i],
+                attachment=documents[i + 1], page_type=constants.PageType.GENERAL, is_active=True,
+            )
+            for i in range(0, 10, 2)
+        )
+
+    def assert_constant_queries(self, client, url):
+        def fetch():
+            self.assertEqual(client.get(url).status_code, 200)
+
+        assert_constant_queries(fetch, self.add_pages)
+
+    def test_mobile_list(self):
+        self.assert_constant_queries(self.client, '/api/v1/utility/mobile/page/?limit=1000')
+
+    def test_admin_list(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        self.assert_constant_queries(client, '/api/v1/utility/admin/page/?limit=1000')
+
+
+class PageValuesParityTests(PageTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        attachment = Document.objects.create(
+            owner=cls.admin, document='documents/terms and conditions.pdf', doc_type=DocumentChoices.FILE
+        )
+        cls.refund.attachment = attachment
+        cls.refund.save(update_fields=['attachment'])
+        # Microseconds and a non UTC offset check the ISO 8601 formatting
+        Page.objects.filter(pk=cls.shipping.pk).update(
+            created_at=datetime.datetime(2024, 3, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone(datetime.timedelta(hours=8)))
+        )
+
+    def assert_same_output(self):
+        queryset = Page.objects.filter(is_active=True).order_by('pk')
+        plan = get_values_plan(PageListSerializer())
+        self.assertIsNotNone(plan)
+        rows = [plan.to_representation(row) for row in queryset.values(*plan.columns)]
+        self.assertEqual(rows, PageListSerializer(queryset, many=True).data)
+        return rows
+
+    def test_values_plan_matches_serializer(self):
+        rows = self.assert_same_output()
+        self.assertEqual(rows[0]['attachment_url'], self.refund.attachment.get_url)
+        self.assertIsNone(rows[1]['attachment_url'])
+        self.assertEqual(rows[1]['thumbnail_url'], self.thumbnail.get_url)
+        self.assertEqual(rows[1]['created_at'], '2024-03-01T00:30:15.123456Z')
+
+    @override_settings(TIME_ZONE='Asia/Kuala_Lumpur')
+    def test_values_plan_matches_serializer_in_local_time(self):
+        rows = self.assert_same_output()
+        self.assertEqual(rows[1]['created_at'], '2024-03-01T08:30:15.123456+08:00')
+
+    def test_list_endpoint(self):
+        response = self.client.get('/api/v1/utility/mobile/page/')
+        self.assertEqual(response.status_code, 200)
+        queryset = Page.objects.filter(pk__in=[page['id'] for page in response.data['results']])
+        expected = {page['id']: page for page in PageListSerializer(queryset, many=True).data}
+        self.assertEqual({page['id']: page for page in response.data['results']}, expected)
+
+
+class SparseFieldsTests(PageTestCase):
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, ' '.join(query['sql'] for query in context.captured_queries)
+
+    @staticmethod
+    def column(name):
+        return f'{connection.ops.quote_name(Page._meta.db_table)}.{connection.ops.quote_name(name)}'
+
+    def test_list_fields(self):
+        data, sql = self.get('/api/v1/utility/mobile/page/?fields=id,title,unknown')
+        self.assertEqual([set(page) for page in data['results']], [{'id', 'title'}] * 2)
+        self.assertIn(self.column('title'), sql)
+        for name in ('desc', 'video_url', 'created_at'):
+            self.assertNotIn(self.column(name), sql)
+        self.assertNotIn(connection.ops.quote_name(Document._meta.db_table), sql)
+
+    def test_list_omit(self):
+        data, sql = self.get('/api/v1/utility/mobile/page/?omit=thumbnail_url,attachment_url')
+        self.assertEqual(set(data['results'][0]), {'id', 'title', 'video_url', 'created_at'})
+        self.assertNotIn(self.column('desc'), sql)
+        self.assertNotIn(connection.ops.quote_name(Document._meta.db_table), sql)
+
+    def test_detail_fields(self):
+        url = f'/api/v1/utility/mobile/page/{self.refund.pk}/'
+        data, sql = self.get(url)
+        self.assertEqual(data['desc'], self.refund.desc)
+        self.assertIn(self.column('desc'), sql)
+        data, sql = self.get(f'{url}?fields=id,title,thumbnail_url')
+        self.assertEqual(data, {'id': self.refund.pk, 'title': 'Refund policy', 'thumbnail_url': self.thumbnail.get_url})
+        self.assertNotIn(self.column('desc'), sql)
+
+    def test_detail_omit(self):
+        data, sql = self.get(f'/api/v1/utility/mobile/page/{self.refund.pk}/?omit=desc')
+        self.assertNotIn('desc', data)
+        self.assertIn('slug', data)
+        self.assertNotIn(self.column('desc'), sql)
+        self.assertIn(self.column('slug'), sql)
+
+
+class SlugTests(PageTestCase):
+    def test_duplicate_titles_get_suffixes(self):
+        self.assertEqual(
+            slug_utils.allocate_slugs(Page, ['Refund policy', 'Refund policy', 'Shipping', 'New page']),
+            ['refund-policy-2', 'refund-policy-3', 'shipping-2', 'new-page'],
+        )
+        self.assertEqual(self.create_page('Refund policy', '').slug, 'refund-policy-2')
+
+    def test_save_retries_after_integrity_error(self):
+        # A concurrent save took the slug between allocation and insert
+        with mock.patch.object(slug_utils, 'generate_unique_slug', side_effect=['shipping', 'shipping-2']):
+            page = self.create_page('Shipping', '')
+        self.assertEqual(page.slug, 'shipping-2')
+
+    def test_bulk_create_retries_after_integrity_error(self):
+        row = {'title': 'Shipping', 'desc': '', 'thumbnail_id': self.thumbnail.pk, 'page_type': constants.PageType.GENERAL}
+        with mock.patch.object(slug_utils, 'allocate_slugs', side_effect=[['shipping'], ['shipping-2']]):
+            pages = page_utils.bulk_create_pages([row])
+        self.assertEqual([page.slug for page in pages], ['shipping-2'])
+        self.assertEqual(Page.objects.filter(slug__startswith='shipping').count(), 2)
+
+
+class PageImportTests(PageTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def import_pages(self, rows):
+        return self.client.post('/api/v1/utility/admin/page/import/', rows, format='json')
+
+    def test_import(self):
+        rows = [
+            {'title': 'Shipping', 'desc': 'Fees', 'thumbnail': self.thumbnail.pk, 'page_type': constants.PageType.GENERAL}
+            for _ in range(2)
+        ]
+        response = self.import_pages(rows)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            sorted(Page.objects.filter(title='Shipping').values_list('slug', flat=True)),
+            ['shipping', 'shipping-2', 'shipping-3'],
+        )
+
+    def test_invalid_document_is_rejected(self):
+        response = self.import_pages([{
+            'title': 'Shipping', 'desc': 'Fees', 'thumbnail': self.thumbnail.pk, 'attachment': self.thumbnail.pk + 100,
+            'page_type': constants.PageType.GENERAL,
+        }])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Page.objects.count(), 3)
+
+
+class PageSearchTests(PageTestCase):
+    def search(self, text):
+        return self.client.get('/api/v1/utility/mobile/page/search/', {'q': text})
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.search('refund')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([page['id'] for page in response.data['results']], [self.refund.pk, self.shipping.pk])
+
+    def test_every_word_must_match(self):
+        pages = search_utils.search_pages(Page.objects.filter(is_active=True), 'refund shipping')
+        self.assertEqual([page.pk for page in pages], [self.shipping.pk])
+
+    def test_text_is_required(self):
+        self.assertEqual(self.search(' ').status_code, 400)
+
+    def test_save_refreshes_search_vector(self):
+        with mock.patch.object(search_utils, 'update_search_vectors') as update:
+            self.refund.desc = 'Returns'
+            self.refund.save()
+            self.refund.save(update_fields=['is_active'])
+            self.refund.save(update_fields=['desc', 'updated_at'])
+        self.assertEqual(update.call_count, 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'The search vector is only stored on PostgreSQL')
+    def test_stored_search_vector_follows_edits(self):
+        self.shipping.desc = 'Delivery fees and parcel tracking'
+        self.shipping.save()
+        queryset = Page.objects.filter(is_active=True)
+        self.assertEqual([page.pk for page in search_utils.search_pages(queryset, 'refund')], [self.refund.pk])
+        self.assertEqual([page.pk for page in search_utils.search_pages(queryset, 'parcel')], [self.shipping.pk])
+
+
+class FixedPageCacheTests(PageTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_reloaded_when_another_worker_invalidates(self):
+        fixed_page_cache = page_utils.FixedPageCache()
+        with self.assertNumQueries(1):
+            self.assertEqual(fixed_page_cache.get()[constants.PageType.GENERAL].pk, self.refund.pk)
+        with self.assertNumQueries(0):
+            fixed_page_cache.get()
+        # A save in another worker only replaces the shared version token
+        Page.objects.filter(pk=self.refund.pk).update(is_active=False)
+        bump_version(fixed_page_cache.version_key)
+        with self.assertNumQueries(1):
+            self.assertEqual(fixed_page_cache.get()[constants.PageType.GENERAL].pk, self.shipping.pk)
@@ -8,10 +8,12 @@ from decouple import config
 from rest_framework import status
 from django.conf import settings
 
-from utility.models import GlobalSettings
 from ..models import Payment
+from .settings_utils import get_global_settings
+from coreapp.utils.http_utils import build_client
 
 BILLPLZ_SERVER = "https://www.billplz-sandbox.com/api/v3"
+client = build_client('billplz', BILLPLZ_SERVER)
 
 logger = logging.getLogger('django')
 
@@ -21,7 +23,7 @@ def get_encode_key(global_settings):
 
 
 def get_settings():
-    return GlobalSettings.objects.first()
+    return get_global_settings()
 
 
 def get_redirect_url():
@@ -52,7 +54,12 @@ def create_bill(donation):
         "Content-Type": "application/x-www-form-urlencoded",
         "Authorization": f"Basic {get_encode_key(global_settings)}"
     }
-    r = requests.post(url=f"{BILLPLZ_SERVER}/bills", data=payload, headers=headers)
+    try:
+        # Creating a bill is not idempotent, only retried when the connection could not be opened
+        r = client.post("/bills", data=payload, headers=headers)
+    except requests.RequestException:
+        logger.exception("BillPlz bill creation failed")
+        return None
     try:
         if r.status_code == status.HTTP_200_OK:
             response = r.json()
@@ -0,0 +1,68 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Min
+
+from utility.models import Page
+from . import search_utils, slug_utils
+from .response_cache_utils import fixed_page_response_cache
+from coreapp.utils.version_utils import VersionedCache
+
+IMPORT_BATCH_SIZE = 1000
+
+
+class FixedPageCache(VersionedCache):
+    """
+    Process local map from page_type to its active page (the lowest pk, as .first() returned), with thumbnail
+    and attachment. Built on first use in each worker, rebuilt after invalidate(), which the Page and Document
+    signals call. The returned pages are shared, treat them as read only.
+    """
+    version_key = 'fixed_pages:version'
+
+    def get_queryset(self):
+        first_pages = Page.objects.filter(is_active=True).values('page_type').annotate(first=Min('pk'))
+        return Page.objects.filter(pk__in=first_pages.values('first')).select_related(
+            'thumbnail', 'attachment'
+        ).defer('search_vector')
+
+    def load(self):
+        return {page.page_type: page for page in self.get_queryset()}
+
+
+fixed_page_cache = FixedPageCache()
+
+
+def get_fixed_page(page_type):
+    """ The active page of page_type, None when there is none or page_type is not a number """
+    try:
+        page_type = int(page_type)
+    except (TypeError, ValueError):
+        return None
+    return fixed_page_cache.get().get(page_type)
+
+
+def invalidate_pages():
+    fixed_page_cache.invalidate()
+    fixed_page_response_cache.invalidate()
+
+
+def bulk_create_pages(rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create one Page per dict of field values (validated, e.g. by PageImportSerializer), with slugs allocated
+    together and the rows written with bulk_create. The unique constraint catches slugs taken concurrently,
+    the whole import is then allocated again. bulk_create skips save() and its signals, search vectors
+    and caches are updated here.
+    """
+    for attempt in range(slug_utils.SLUG_ATTEMPTS):
+        pages = [Page(**row) for row in rows]
+        for page, slug in zip(pages, slug_utils.allocate_slugs(Page, [page.title for page in pages])):
+            page.slug = slug
+        try:
+            with transaction.atomic():
+                pages = Page.objects.bulk_create(pages, batch_size=batch_size)
+                search_utils.update_search_vectors(Page.objects.filter(pk__in=[page.pk for page in pages]))
+        except IntegrityError:
+            slugs = [page.slug for page in pages]
+            if attempt == slug_utils.SLUG_ATTEMPTS - 1 or not Page.objects.filter(slug__in=slugs).exists():
+                raise
+            continue
+        transaction.on_commit(invalidate_pages)
+        return pages
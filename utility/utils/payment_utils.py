@@ -1,9 +1,130 @@
+import asyncio
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
 from utility import constants
+from utility.models import Payment, PaymentOutbox
 from utility.utils import billplz_utils, paypal_utils
 
+logger = logging.getLogger('django')
+
+POLL_INTERVAL = 0.25
+
+
+def get_ready_key(uid):
+    return f"payment:ready:{uid}"
+
+
+def fake_create_bill(payment):
+    """ Stands in for BillPlz and PayPal when PAYMENT_FAKE_PROVIDER is set (tests, local development) """
+    payment.bill_uid = f"fake-{payment.uid}"
+    payment.bill_url = f"{settings.MEDIA_HOST}/utility/payment/fake/{payment.uid}/"
+    payment.save(update_fields=['bill_uid', 'bill_url', 'updated_at'])
+    return payment.bill_url
+
 
 def generate_bill_url(payment):
+    if settings.PAYMENT_FAKE_PROVIDER:
+        return fake_create_bill(payment)
     if payment.payment_method == constants.PaymentMethod.BILLPLZ:
         return billplz_utils.create_bill(payment)
     else:
-        return paypal_utils.create_payment(payment)
\ No newline at end of file
+        return paypal_utils.create_payment(payment)
+
+
+def create_payment(amount, payment_method, ip_address):
+    """ A pending Payment and its outbox row in one transaction, the bill is created by process_payment_outbox """
+    with transaction.atomic():
+        payment = Payment.objects.create(amount=amount, payment_method=payment_method, ip_address=ip_address)
+        PaymentOutbox.objects.create(payment=payment)
+    return payment
+
+
+def claim_outbox(limit):
+    """
+    Up to limit due outbox rows, with their payment, claimed for PAYMENT_OUTBOX_CLAIM_TIMEOUT seconds. Each claim
+    is a conditional UPDATE on the status and available_at that were read, so two workers never both claim a row
+    (no SELECT ... FOR UPDATE SKIP LOCKED needed, SQLite works too). Rows of a worker that died are claimable
+    again once their claim expires.
+    """
+    now = timezone.now()
+    candidates = PaymentOutbox.objects.filter(
+        status__in=[constants.OutboxStatus.PENDING, constants.OutboxStatus.PROCESSING], available_at__lte=now
+    ).order_by('available_at').values_list('pk', 'status', 'available_at')[:limit]
+    claimed = []
+    for pk, status, available_at in candidates:
+        if PaymentOutbox.objects.filter(pk=pk, status=status, available_at=available_at).update(
+            status=constants.OutboxStatus.PROCESSING, attempts=F('attempts') + 1, updated_at=now,
+            available_at=now + datetime.timedelta(seconds=settings.PAYMENT_OUTBOX_CLAIM_TIMEOUT),
+        ):
+            claimed.append(pk)
+    return list(PaymentOutbox.objects.filter(pk__in=claimed).select_related('payment'))
+
+
+def process_outbox_entry(outbox):
+    """
+    Ask the provider for the bill of a claimed row, no transaction is open during the call. The provider utils
+    store bill_uid and bill_url on the payment. Failures are retried with exponential backoff until
+    PAYMENT_OUTBOX_MAX_ATTEMPTS, then the payment is marked failed.
+    """
+    payment = outbox.payment
+    try:
+        bill_url = generate_bill_url(payment)
+        error = '' if bill_url else 'The provider returned no bill url'
+    except Exception as exc:
+        logger.exception(f"Bill creation failed for payment {payment.uid}")
+        bill_url, error = None, repr(exc)
+
+    now = timezone.now()
+    queryset = PaymentOutbox.objects.filter(pk=outbox.pk)
+    if bill_url:
+        queryset.update(status=constants.OutboxStatus.DONE, last_error='', updated_at=now)
+    elif outbox.attempts >= settings.PAYMENT_OUTBOX_MAX_ATTEMPTS:
+        logger.error(f"Giving up bill creation for payment {payment.uid} after {outbox.attempts} attempts")
+        with transaction.atomic():
+            queryset.update(status=constants.OutboxStatus.FAILED, last_error=error, updated_at=now)
+            Payment.objects.filter(pk=payment.pk).update(status=constants.PaymentStatus.FAILED, updated_at=now)
+    else:
+        delay = settings.PAYMENT_OUTBOX_RETRY_BACKOFF * 2 ** (outbox.attempts - 1)
+        queryset.update(
+            status=constants.OutboxStatus.PENDING, last_error=error, updated_at=now,
+            available_at=now + datetime.timedelta(seconds=delay),
+        )
+        return False
+    # Wakes up the clients polling this payment
+    cache.set(get_ready_key(payment.uid), True, settings.PAYMENT_POLL_TIMEOUT * 2)
+    return bool(bill_url)
+
+
+def get_bill_status(payment):
+    """ The outbox status of the payment's bill, DONE for payments created before the outbox """
+    try:
+        return payment.outbox.status
+    except PaymentOutbox.DoesNotExist:
+        return constants.OutboxStatus.DONE
+
+
+async def aget_payment(uid):
+    return await Payment.objects.select_related('outbox').filter(uid=uid).afirst()
+
+
+async def await_bill(uid, timeout):
+    """
+    The payment, once its bill is created or given up, or after timeout seconds. Waiting polls a cache key set by
+    the worker without holding a thread, the database is read again only when it appears.
+    """
+    payment = await aget_payment(uid)
+    deadline = time.monotonic() + timeout
+    pending = (constants.OutboxStatus.PENDING, constants.OutboxStatus.PROCESSING)
+    while payment is not None and get_bill_status(payment) in pending and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        if await cache.aget(get_ready_key(uid)):
+            payment = await aget_payment(uid)
+    return payment
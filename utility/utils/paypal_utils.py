@@ -1,38 +1,181 @@
+import hashlib
 import logging
+import threading
+import time
 
 import requests
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.conf import settings
 from utility.constants import PaymentStatus
-from utility.models import GlobalSettings, Payment
+from utility.models import Payment
+from .settings_utils import get_global_settings
+from coreapp.utils.http_utils import build_client
 
 logger = logging.getLogger('django')
 SERVER_URL = "https://api-m.sandbox.paypal.com"
+client = build_client('paypal', SERVER_URL)
 
 
 def get_settings():
-    return GlobalSettings.objects.first()
+    return get_global_settings()
 
 
-def get_access_token():
-    global_settings = get_settings()
+def request_access_token(global_settings):
+    """ A new OAuth token from PayPal, as (access_token, expires_in seconds), None on failure """
     headers = {
         "Accept": "application/json",
         "Accept-Language": "en_US",
     }
     payload = {"grant_type": "client_credentials"}
-    response = requests.post(
-        f"{SERVER_URL}/v1/oauth2/token",
-        data=payload,
-        headers=headers,
-        auth=(global_settings.paypal_client_id, global_settings.paypal_client_secret),
-    )
+    try:
+        # Asking for a token twice is harmless
+        response = client.post(
+            "/v1/oauth2/token",
+            data=payload,
+            headers=headers,
+            auth=(global_settings.paypal_client_id, global_settings.paypal_client_secret),
+            idempotent=True,
+        )
+    except requests.RequestException:
+        logger.exception("PayPal access token request failed")
+        return None
     if response.status_code == 200:
-        return response.json()["access_token"]
+        data = response.json()
+        return data["access_token"], int(data.get("expires_in", 0))
     else:
         return None
 
 
+class AccessTokenCache:
+    """
+    PayPal OAuth tokens in the shared cache per client id, used until expires_in minus expiry_margin seconds.
+    Once less than refresh_ahead seconds are left, the current token is still returned and one background thread
+    fetches the next, so requests don't wait for PayPal. Fetches are single flight: one thread per process (an
+    Event the others wait on, no lock is held during the call) and one worker (a cache.add lock) at a time, the
+    others wait up to wait_timeout seconds for its token. Entries keep a fingerprint of the client secret, a token
+    issued for a previous secret is never used.
+    """
+
+    def __init__(self, fetch, expiry_margin, refresh_ahead, lock_timeout=15, wait_timeout=5, poll_interval=0.05):
+        self.fetch = fetch
+        self.expiry_margin = expiry_margin
+        self.refresh_ahead = refresh_ahead
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        # Guards _flight only, never held while waiting or fetching
+        self._lock = threading.Lock()
+        self._flight = None
+
+    def get_key(self, global_settings):
+        return f"paypal:token:{global_settings.paypal_client_id}"
+
+    def get_fingerprint(self, global_settings):
+        return hashlib.sha256(global_settings.paypal_client_secret.encode()).hexdigest()
+
+    def get_entry(self, global_settings, min_lifetime=0):
+        """ The stored entry if it was issued for the current secret and is usable for min_lifetime seconds """
+        entry = cache.get(self.get_key(global_settings))
+        if entry is None or entry['fingerprint'] != self.get_fingerprint(global_settings):
+            return None
+        if entry['expires_at'] - time.time() <= min_lifetime:
+            return None
+        return entry
+
+    def get(self, global_settings):
+        entry = self.get_entry(global_settings)
+        if entry is None:
+            return self.refresh(global_settings)
+        if entry['expires_at'] - time.time() < self.refresh_ahead:
+            self.refresh_in_background(global_settings)
+        return entry['token']
+
+    def wait_for_refresh(self, global_settings):
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = self.get_entry(global_settings, self.refresh_ahead)
+            if entry is not None:
+                return entry
+        return None
+
+    def refresh(self, global_settings, wait=True):
+        """ Fetch and store a new token, unless another thread or worker just did or (wait=False) is doing it """
+        entry = self.get_entry(global_settings, self.refresh_ahead)
+        if entry is not None:
+            return entry['token']
+        with self._lock:
+            flight, owner = self._flight, self._flight is None
+            if owner:
+                flight = self._flight = threading.Event()
+        if not owner:
+            if not wait:
+                return None
+            flight.wait(self.wait_timeout)
+            entry = self.get_entry(global_settings)
+            return entry['token'] if entry else None
+        try:
+            return self.fetch_and_store(global_settings, wait)
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.set()
+
+    def fetch_and_store(self, global_settings, wait):
+        lock_key = f"{self.get_key(global_settings)}:lock"
+        if not cache.add(lock_key, 1, self.lock_timeout):
+            if not wait:
+                return None
+            entry = self.wait_for_refresh(global_settings)
+            if entry is not None:
+                return entry['token']
+            # The other worker is slow or gone, fetch anyway
+        try:
+            result = self.fetch(global_settings)
+        finally:
+            cache.delete(lock_key)
+        if result is None:
+            entry = self.get_entry(global_settings)
+            return entry['token'] if entry else None
+        token, expires_in = result
+        lifetime = expires_in - self.expiry_margin
+        if lifetime > 0:
+            cache.set(self.get_key(global_settings), {
+                'token': token,
+                'fingerprint': self.get_fingerprint(global_settings),
+                'expires_at': time.time() + lifetime,
+            }, lifetime)
+        return token
+
+    def refresh_in_background(self, global_settings):
+        with self._lock:
+            if self._flight is not None:
+                return
+
+        def run():
+            try:
+                self.refresh(global_settings, wait=False)
+            except Exception:
+                logger.exception("PayPal access token refresh failed")
+
+        threading.Thread(target=run, name='paypal-token-refresh', daemon=True).start()
+
+    def invalidate(self, global_settings):
+        cache.delete(self.get_key(global_settings))
+
+
+token_cache = AccessTokenCache(
+    request_access_token,
+    expiry_margin=settings.PAYPAL_TOKEN_EXPIRY_MARGIN,
+    refresh_ahead=settings.PAYPAL_TOKEN_REFRESH_AHEAD,
+)
+
+
+def get_access_token():
+    return token_cache.get(get_settings())
+
+
 def create_payment(payment):
     payload = {
         "intent": "CAPTURE",
@@ -47,13 +190,23 @@ def create_payment(payment):
             "cancel_url": f"{settings.MEDIA_HOST}/utility/payment/paypal/status/cancel/",
         },
     }
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {get_access_token()}",
-    }
-    response = requests.post(
-        f"{SERVER_URL}/v2/checkout/orders", json=payload, headers=headers
-    )
+    global_settings = get_settings()
+    try:
+        for attempt in range(2):
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {token_cache.get(global_settings)}",
+                # PayPal returns the existing order for a repeated request id, so the call can be retried
+                "PayPal-Request-Id": str(payment.uid),
+            }
+            response = client.post("/v2/checkout/orders", json=payload, headers=headers, idempotent=True)
+            if response.status_code != 401:
+                break
+            # Revoked before its expiry, fetch a new one once
+            token_cache.invalidate(global_settings)
+    except requests.RequestException:
+        logger.exception("PayPal order creation failed")
+        return None
     if response.status_code == 201 or response.status_code == 200:
         data = response.json()
         links = data["links"]
@@ -0,0 +1,5 @@
+from coreapp.utils.response_cache_utils import ResponseCache
+
+# Invalidated from utility.signals
+info_response_cache = ResponseCache('info')
+fixed_page_response_cache = ResponseCache('fixed_page')
@@ -0,0 +1,54 @@
+from functools import reduce
+from operator import and_
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Substr
+
+SEARCH_CONFIG = 'english'
+HEADLINE_OPTIONS = {'start_sel': '<mark>', 'stop_sel': '</mark>', 'min_words': 15, 'max_words': 35}
+FALLBACK_HEADLINE_LENGTH = 200
+
+
+def is_full_text_search(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def get_page_search_vector():
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('desc', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """ Refresh the stored Page.search_vector of the queryset rows, one UPDATE. Nothing to do without PostgreSQL """
+    if is_full_text_search(queryset.db):
+        queryset.update(search_vector=get_page_search_vector())
+
+
+def search_pages(queryset, text):
+    """
+    Pages of queryset matching text (web search syntax: words, "phrases", -exclusions, or), best first, annotated
+    with rank and a highlighted desc headline. On PostgreSQL the match goes through the GIN indexed
+    search_vector column. Elsewhere (SQLite in tests) every word must appear in title or desc (LIKE), pages
+    with all of them in the title rank first and the headline is the start of desc, without highlighting.
+    """
+    if is_full_text_search(queryset.db):
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            headline=SearchHeadline('desc', query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS),
+        ).order_by('-rank', 'pk')
+
+    terms = text.split()
+    if not terms:
+        return queryset.none()
+    in_title = reduce(and_, (Q(title__icontains=term) for term in terms))
+    return queryset.filter(
+        reduce(and_, (Q(title__icontains=term) | Q(desc__icontains=term) for term in terms))
+    ).annotate(
+        rank=Case(When(in_title, then=Value(1.0)), default=Value(0.5), output_field=FloatField()),
+        headline=Substr('desc', 1, FALLBACK_HEADLINE_LENGTH),
+    ).order_by('-rank', 'pk')
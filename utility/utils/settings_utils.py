@@ -0,0 +1,30 @@
+from utility.models import GlobalSettings
+from coreapp.utils.version_utils import VersionedCache
+
+
+class GlobalSettingsCache(VersionedCache):
+    """
+    Process local copy of the GlobalSettings row, with its logo Document: a hit costs one cache.get instead of
+    one or two queries. The returned instance is shared, treat it as read only.
+    """
+    version_key = 'global_settings:version'
+
+    def get_queryset(self):
+        return GlobalSettings.objects.select_related('logo')
+
+    def load(self):
+        return self.get_queryset().first()
+
+    async def aload(self):
+        return await self.get_queryset().afirst()
+
+
+global_settings_cache = GlobalSettingsCache()
+
+
+def get_global_settings():
+    return global_settings_cache.get()
+
+
+async def aget_global_settings():
+    return await global_settings_cache.aget()
@@ -1,10 +1,67 @@
-from django.utils.crypto import get_random_string
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.utils.text import slugify
 
+# Room kept at the end of the slug field for a "-<number>" suffix
+SUFFIX_LENGTH = 7
+SLUG_ATTEMPTS = 3
+TAKEN_SLUGS_CHUNK_SIZE = 200
+
+
+def get_slug_base(slug_content, model):
+    max_length = model._meta.get_field('slug').max_length
+    return slugify(slug_content)[:max_length - SUFFIX_LENGTH].strip('-') or model._meta.model_name
+
+
+def get_taken_slugs(model, bases):
+    """ Existing slugs equal to or starting with "<base>-" for any of the bases, one query """
+    condition = Q()
+    for base in bases:
+        condition |= Q(slug=base) | Q(slug__startswith=f"{base}-")
+    return set(model.objects.filter(condition).values_list('slug', flat=True))
+
+
+def allocate_slugs(model, slug_contents):
+    """
+    Free slugs for slug_contents, in order: the slugified content, or the first free "<slug>-<number>" from 2.
+    Existing slugs are read in one query per TAKEN_SLUGS_CHUNK_SIZE distinct slugs, the rest is done in memory.
+    Concurrent writers can take the same slug, callers save inside save_with_unique_slug / with retry.
+    """
+    bases = [get_slug_base(slug_content, model) for slug_content in slug_contents]
+    distinct_bases = sorted(set(bases))
+    taken = set()
+    for index in range(0, len(distinct_bases), TAKEN_SLUGS_CHUNK_SIZE):
+        taken |= get_taken_slugs(model, distinct_bases[index:index + TAKEN_SLUGS_CHUNK_SIZE])
+
+    next_numbers = {}
+    slugs = []
+    for base in bases:
+        number = next_numbers.get(base, 1)
+        slug = base if number == 1 else f"{base}-{number}"
+        while slug in taken:
+            number += 1
+            slug = f"{base}-{number}"
+        taken.add(slug)
+        next_numbers[base] = number + 1
+        slugs.append(slug)
+    return slugs
+
 
 def generate_unique_slug(slug_content, instance):
-    slug = slugify(slug_content)
+    return allocate_slugs(instance.__class__, [slug_content])[0]
+
+
+def save_with_unique_slug(instance, slug_content, save, *args, **kwargs):
+    """
+    Allocate instance.slug and call save(*args, **kwargs). A concurrent save that took the same slug fails on
+    the unique constraint, the slug is then allocated again, up to SLUG_ATTEMPTS times.
+    """
     KClass = instance.__class__
-    while KClass.objects.filter(slug=slug).exists():
-        slug = slug + "-" + get_random_string(length=5)
-    return slug
+    for attempt in range(SLUG_ATTEMPTS):
+        instance.slug = generate_unique_slug(slug_content, instance)
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            if attempt == SLUG_ATTEMPTS - 1 or not KClass.objects.filter(slug=instance.slug).exists():
+                raise